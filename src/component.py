@@ -1,6 +1,12 @@
+import csv
+import importlib.util
+import json
 import os
 import logging
+import tempfile
+import time
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 import dlt
@@ -13,14 +19,31 @@ from keboola.component.exceptions import UserException
 from keboola.component.sync_actions import SelectElement
 from kbcstorage.client import Client
 
+import resource_limits
 from configuration import Configuration
+from database_store import DatabaseStore
+from run_metrics import RunMetrics, RUN_METRICS_COLUMNS
 
-from dlt_zendesk import zendesk_support, zendesk_mapping
+from dlt_zendesk import zendesk_support, zendesk_mapping, WATERMARK_RESOURCES, SIDELOADED_ENTITIES
+from dlt_zendesk.helpers.rate_limiter import RateLimiter
+from dlt_zendesk.helpers.ticket_index import TicketIndex
 
 DLT_TMP_DIR = "/tmp/.dlt"
 DUCKDB_TMP_DIR = "/tmp/.dlt"
+DUCKDB_SPILL_DIR = "/tmp/.dlt/duckdb_spill"
+# share of the container memory given to DuckDB
+DUCKDB_MEMORY_SHARE = 0.5
+MAX_EXTRACT_WORKERS = 40
 DATASET_NAME = "zendesk_data"
+EXPORT_SCHEMA = "zendesk_export"
+PARQUET_FILE_TAG = "zendesk"
 PIPELINE_NAME = "dlt_zendesk_pipeline"
+RUN_METRICS_TABLE = "run_metrics"
+TICKET_INDEX_TABLE = "ticket_details_index"
+CHECKPOINT_TABLE = "run_checkpoint"
+# row hashes of the exported views are kept in the tables named `{view}{ROW_HASHES_SUFFIX}`
+ROW_HASHES_SUFFIX = "_row_hashes"
+RUN_METRICS_ARTIFACT = "artifacts/out/current/run_metrics.json"
 
 DEFAULT_START_DATE: int = pendulum.datetime(year=2000, month=1, day=1).int_timestamp
 
@@ -30,22 +53,40 @@ class Component(ComponentBase):
         super().__init__()
         self.params = None
         self.pipeline_destination = None
+        self.pipeline_connection = None
         self.connection = None
         self.pipeline_name = None
         self.dataset_name = None
+        self.resources_state = None
+        self.database_store = None
+        self.duckdb_config = None
+        self.metrics = None
+        self.ticket_index = None
+        self.views = None
+        self.response_cache = None
+        self.committed_start = None
 
     def run(self):
         """
         Main execution code
         """
         self.params = Configuration(**self.configuration.parameters)
+        self.views = self._select_views()
+        if self.params.destination.changed_rows_only and not (self.params.performance.persistent_database
+                                                              and self.params.destination.is_incremental_load_type):
+            raise UserException("Changed rows only requires the persistent database and the incremental load")
+        if self.params.performance.checkpoint_pages and not self.params.performance.persistent_database:
+            raise UserException("The checkpoints are kept in the persistent database, which is not enabled")
 
         # create the actual start time here for elimination possible data gaps
         actual_start = pendulum.now().int_timestamp
+        self.metrics = RunMetrics(actual_start)
 
-        # get the previous start time
+        # get the previous start time, it also marks the last run whose data are in Storage
+        previous_state = self.get_state_file()
+        self.committed_start = self._get_committed_start(previous_state)
         if self.params.sync_options.is_incremental:
-            previous_start: int = self.get_state_file().get("time", {}).get("previousStart", DEFAULT_START_DATE)
+            previous_start: int = previous_state.get("time", {}).get("previousStart", DEFAULT_START_DATE)
             logging.info("Incremental mode")
         else:
             previous_start = DEFAULT_START_DATE
@@ -53,24 +94,146 @@ class Component(ComponentBase):
         load_from_iso: int = ensure_pendulum_datetime(previous_start).int_timestamp
         logging.info(f"Loading data from {pendulum.from_timestamp(load_from_iso)}")
 
+        # every selected resource continues from its own watermark
+        self.resources_state = self._get_resources_state(previous_state, load_from_iso)
+        self.response_cache = self._get_response_cache(previous_state)
+
         # set the DLT environment
         self._set_dlt()
 
-        # run the pipeline
-        loaded_tables = self._run_dlt_pipeline(load_from_iso)
+        # a run which did not finish continues from its last checkpoint
+        checkpoint = self._load_checkpoint()
+        if checkpoint:
+            actual_start, load_from_iso = checkpoint["actual_start"], checkpoint["load_from"]
+            self.resources_state = checkpoint["resources"]
+            logging.info(f"Continuing the run started at {pendulum.from_timestamp(actual_start)} from its checkpoint")
+
+        # run the pipeline, the checkpoint rounds share one pool fetching the ticket details
+        with ThreadPoolExecutor(max_workers=self.params.performance.ticket_details_concurrency,
+                                thread_name_prefix="ticket_details") as details_executor:
+            loaded_tables, load_ids = self._run_dlt_pipeline(load_from_iso, actual_start, details_executor, checkpoint)
 
         # initialize the connection
         self._init_connection(duck_db_file=self.duckdb_file)
 
         # prepare the views
-        views_to_export = self._prepare_views(loaded_tables)
-
-        # export views to the CSV
-        self._export_views(views_to_export)
+        with self.metrics.stage("views"):
+            views_to_export = self._prepare_views(loaded_tables, load_ids, actual_start)
+
+        # export views to the CSV or Parquet
+        with self.metrics.stage("export"):
+            self._export_views(views_to_export)
+
+        # report the metrics of the run
+        self._write_metrics()
+
+        # keep the database for the next run
+        if self.database_store:
+            self._save_ticket_index(self.connection)
+            self.connection.execute(f"DROP TABLE IF EXISTS {self.dataset_name}.{CHECKPOINT_TABLE};")
+            if self.params.destination.changed_rows_only:
+                self._save_row_hashes(views_to_export, actual_start)
+            self.connection.execute("CHECKPOINT;")
+        self.connection.close()
+        if self.database_store:
+            self.database_store.save(self.duckdb_file)
 
         # save the state
         logging.info(f"Saving the state file with the actual start date {actual_start}")
-        self.write_state_file({"time": {"previousStart": actual_start}})
+        self.write_state_file(self._build_state(previous_state, actual_start))
+
+    @staticmethod
+    def _get_committed_start(previous_state: dict):
+        previous_start = previous_state.get("time", {}).get("previousStart")
+        return ensure_pendulum_datetime(previous_start).int_timestamp if previous_start is not None else None
+
+    @staticmethod
+    def _committed_run_filter(run_start_column: str, run_start: int, committed_start) -> str:
+        """
+        SQL condition keeping the rows of the ticket index or the row hashes saved by the committed runs.
+        The state file is committed only once the whole job including the output mapping succeeded, so the data
+        saved to the persistent database by a later run, e.g. one whose output mapping failed, may be missing in
+        Storage and are fetched and exported again. The rows saved by the checkpoints of the continued run are
+        its own and are kept.
+        """
+        committed = "NULL" if committed_start is None else int(committed_start)
+        return f"({run_start_column} <= {committed} OR {run_start_column} = {int(run_start)})"
+
+    def _get_resources_state(self, previous_state: dict, load_from_iso: int) -> dict:
+        """
+        Prepares the watermarks and cursors of the selected resources. A resource which was turned off keeps
+        its state in the state file and continues from it once it is selected again. The same holds for the
+        entities sideloaded by the tickets export.
+        """
+        selected = self._selected_resources()
+        previous_resources = previous_state.get("resources", {}) if self.params.sync_options.is_incremental else {}
+        # the state written before the per resource watermarks holds only the common start time
+        default_start = DEFAULT_START_DATE if "resources" in previous_state else load_from_iso
+
+        resources_state = {}
+        for key, resource in WATERMARK_RESOURCES.items():
+            if resource not in selected:
+                continue
+            resources_state[key] = {"start_time": default_start, **previous_resources.get(key, {})}
+            logging.info(f"Loading {key} from {pendulum.from_timestamp(resources_state[key]['start_time'])}")
+        return resources_state
+
+    def _build_state(self, previous_state: dict, actual_start: int) -> dict:
+        """
+        Moves the watermarks of the resources loaded by this run to its start, other resources keep theirs
+        """
+        selected = self._selected_resources()
+        resources = dict(previous_state.get("resources", {}))
+        for key, resource_state in self.resources_state.items():
+            # the tickets export also runs unselected when it only feeds the ticket details
+            if WATERMARK_RESOURCES[key] in selected:
+                resources[key] = {**resource_state, "start_time": actual_start}
+        state = {"time": {"previousStart": actual_start}, "resources": resources}
+        if self.response_cache is not None:
+            state["response_cache"] = self.response_cache
+        return state
+
+    def _get_response_cache(self, previous_state: dict):
+        """
+        Prepares the cache of the reference endpoints, the tables of the unchanged ones are not exported again.
+        So it is valid only for the same destination settings and a full sync starts with an empty cache.
+        """
+        if not self.params.performance.cache_reference_endpoints:
+            return None
+        destination = self.params.destination.model_dump()
+        cache = previous_state.get("response_cache", {}) if self.params.sync_options.is_incremental else {}
+        if cache.get("destination") != destination:
+            return {"destination": destination, "endpoints": {}}
+        return cache
+
+    def _select_views(self) -> list:
+        """
+        Output views requested by the configuration, the views built from turned off details are left out
+        """
+        output_tables = self.params.destination.output_tables
+        unknown = set(output_tables) - {view.name for view in zendesk_mapping.views}
+        if unknown:
+            raise UserException(f"Unknown output tables: {', '.join(sorted(unknown))}")
+        details = self.params.available_details.dict()
+        return [view for view in zendesk_mapping.views
+                if (not output_tables or view.name in output_tables)
+                and all(details.get(table, True) for table in view.source_tables)]
+
+    def _sideloads_ticket_entities(self) -> bool:
+        # the sideloads hold only the entities of the changed tickets, a full load would replace the tables by them
+        sideloaded = {f"{entity}_raw" for entity in SIDELOADED_ENTITIES}
+        return self.params.sync_options.is_sideloading_ticket_entities \
+            and self.params.destination.is_incremental_load_type \
+            and any(table in sideloaded for view in self.views for table in view.source_tables)
+
+    def _selected_resources(self) -> set:
+        """
+        Raw tables the selected views are built from, the entities sideloaded by the tickets export come with it
+        """
+        resources = {table for view in self.views for table in view.source_tables}
+        if self._sideloads_ticket_entities():
+            resources = resources - {f"{entity}_raw" for entity in SIDELOADED_ENTITIES} | {"tickets_raw"}
+        return resources
 
     def _set_dlt(self):
         # prepare the temporary directories
@@ -84,10 +247,22 @@ class Component(ComponentBase):
         os.environ["SOURCES__CREDENTIALS__SUBDOMAIN"] = self.params.authentication.sub_domain
         os.environ["SOURCES__CREDENTIALS__EMAIL"] = self.params.authentication.email
         os.environ["SOURCES__CREDENTIALS__TOKEN"] = self.params.authentication.api_token
-        os.environ["EXTRACT__WORKERS"] = "40"
+        # the workers are sized by the container limits unless set in the configuration
+        performance = self.params.performance
+        cpus = resource_limits.cpu_limit()
+        memory_mb = resource_limits.memory_limit() // (1024 * 1024)
+        logging.info(f"Container limits: {cpus} CPUs, {memory_mb} MB memory")
+        # extraction waits for the network, normalization runs in processes and needs a CPU per worker
+        os.environ["EXTRACT__WORKERS"] = str(performance.extract_workers or min(MAX_EXTRACT_WORKERS, 8 * cpus))
         os.environ["EXTRACT__MAX_PARALLEL_ITEMS"] = "100"
-        os.environ["NORMALIZE__WORKERS"] = "40"
-        os.environ["LOAD__WORKERS"] = "40"
+        os.environ["NORMALIZE__WORKERS"] = str(performance.normalize_workers or cpus)
+        # loading waits for the files and the database, so it keeps the dlt default unless set in the configuration
+        if performance.load_workers:
+            os.environ["LOAD__WORKERS"] = str(performance.load_workers)
+        else:
+            os.environ.pop("LOAD__WORKERS", None)
+        # the Arrow tables skip the row normalization, the load id still marks the rows of each run
+        os.environ["NORMALIZE__PARQUET_NORMALIZER__ADD_DLT_LOAD_ID"] = "true"
 
         # set the dataset and pipeline names
         self.dataset_name = DATASET_NAME
@@ -97,15 +272,23 @@ class Component(ComponentBase):
         # check if the duckdb file exists delete it - especially for the local run
         if os.path.exists(self.duckdb_file):
             os.remove(self.duckdb_file)
-        # set the duckdb connection
-        config = dict(threads="6",
-                      memory_limit="1024MB",
-                      max_memory="1024MB")
-
-        conn = duckdb.connect(self.duckdb_file, config=config)
-        self.pipeline_destination = dlt.destinations.duckdb(conn)
-
-    def _run_dlt_pipeline(self, start_date_iso) -> list:
+        # the persistent database is restored from the previous run
+        if self.params.performance.persistent_database:
+            self.database_store = self._init_database_store()
+            self.database_store.restore(self.duckdb_file)
+        # set the duckdb connection, the rest of the memory is left to the pipeline and queries spill to disk
+        duckdb_memory_mb = performance.duckdb_memory_limit_mb or int(memory_mb * DUCKDB_MEMORY_SHARE)
+        os.makedirs(DUCKDB_SPILL_DIR, exist_ok=True)
+        self.duckdb_config = dict(threads=str(performance.duckdb_threads or cpus),
+                                  memory_limit=f"{duckdb_memory_mb}MB",
+                                  max_memory=f"{duckdb_memory_mb}MB",
+                                  temp_directory=DUCKDB_SPILL_DIR)
+        logging.info(f"DuckDB configuration: {self.duckdb_config}")
+
+        self.pipeline_connection = duckdb.connect(self.duckdb_file, config=self.duckdb_config)
+        self.pipeline_destination = dlt.destinations.duckdb(self.pipeline_connection)
+
+    def _run_dlt_pipeline(self, start_date_iso, actual_start, details_executor, checkpoint=None) -> list:
         # prepare the pipeline
         logging.info("Preparing DLT pipeline")
         pipeline = dlt.pipeline(
@@ -117,76 +300,296 @@ class Component(ComponentBase):
         )
 
         # filter the source by selected details
-        logging.info("Filtering the source by selected details")
-        source = zendesk_support(start_date_iso)
-        for key, value in self.params.available_details.dict().items():
-            source.resources[key].selected = value
-
-        # run the pipeline
-        logging.info("Running the DLT pipeline")
-        pipeline = pipeline.run(source, refresh="drop_sources")
-        logging.info("Pipeline finished")
-        pipeline.raise_on_failed_jobs()
-
-        # get the loaded tables
-        logging.debug("Getting the loaded tables")
-        loaded_tables = []
-        for package in pipeline.load_packages:
-            jobs = package.jobs.get("completed_jobs", [])
-            for job in jobs:
-                table = job.job_file_info.table_name
-                if not table.startswith("dlt_"):
-                    loaded_tables.append(table)
-
-        return loaded_tables
-
-    def _prepare_views(self, loaded_tables):
+        if self.params.performance.arrow_extraction and importlib.util.find_spec("pyarrow") is None:
+            raise UserException("The Arrow extraction requires the pyarrow package")
+        self.ticket_index = self._load_ticket_index(actual_start)
+        # the tables and loads of the checkpointed part of the run are exported as well
+        loaded_tables = list(checkpoint["loaded_tables"]) if checkpoint else []
+        load_ids = list(checkpoint["load_ids"]) if checkpoint else []
+        # with the checkpoints the cursor based exports are loaded in rounds of limited pages
+        max_pages = self.params.performance.checkpoint_pages or None
+        # the rounds share the request budget, e.g. of the incremental exports
+        rate_limiter = RateLimiter()
+        selected = self._selected_resources()
+        while True:
+            logging.info("Filtering the source by selected details")
+            source = zendesk_support(start_date_iso,
+                                     details_from_ticket_events=self.params.sync_options.is_details_from_ticket_events,
+                                     details_executor=details_executor,
+                                     prefetch_pages=self.params.performance.prefetch_pages,
+                                     backfill_windows=self.params.performance.backfill_windows,
+                                     arrow_extraction=self.params.performance.arrow_extraction,
+                                     sideload_ticket_entities=self._sideloads_ticket_entities(),
+                                     metrics=self.metrics.requests,
+                                     ticket_index=self.ticket_index,
+                                     response_cache=self.response_cache["endpoints"] if self.response_cache else None,
+                                     max_pages=max_pages,
+                                     rate_limiter=rate_limiter,
+                                     state=self.resources_state)
+            # only the endpoints of the selected views are called
+            for name, resource in source.resources.items():
+                resource.selected = name in selected
+            logging.info(f"Selected resources: {', '.join(sorted(selected))}")
+
+            # run the pipeline, the incremental exports are upserted into the persistent database by the primary keys
+            # of their raw tables, the other endpoints return all their rows and replace their tables
+            logging.info("Running the DLT pipeline")
+            if self.database_store:
+                for name in set(WATERMARK_RESOURCES.values()) & set(source.resources):
+                    source.resources[name].apply_hints(write_disposition="merge")
+                load_info = pipeline.run(source)
+            else:
+                load_info = pipeline.run(source, refresh="drop_sources")
+            logging.info("Pipeline finished")
+            self.metrics.add_pipeline_trace(pipeline.last_trace)
+            load_info.raise_on_failed_jobs()
+
+            # get the loaded tables, a replaced table without rows, e.g. of an endpoint unchanged since the cached
+            # response, was only truncated
+            logging.debug("Getting the loaded tables")
+            row_counts = pipeline.last_trace.last_normalize_info.row_counts
+            for package in load_info.load_packages:
+                load_ids.append(package.load_id)
+                jobs = package.jobs.get("completed_jobs", [])
+                for job in jobs:
+                    table = job.job_file_info.table_name
+                    if not table.startswith("dlt_") and row_counts.get(table):
+                        loaded_tables.append(table)
+
+            selected = self._unfinished_resources()
+            if not selected:
+                break
+            self._save_checkpoint(start_date_iso, actual_start, loaded_tables, load_ids)
+
+        # DuckDB shares one database instance per file in the process, it is released once all connections close
+        self.pipeline_connection.close()
+        return loaded_tables, load_ids
+
+    def _unfinished_resources(self) -> set:
+        """
+        Selected resources whose cursor based export stopped at the page limit, with the ticket details following it
+        """
+        unfinished = {WATERMARK_RESOURCES[key] for key, resource_state in self.resources_state.items()
+                      if resource_state.get("end_of_stream") is False}
+        if "tickets_raw" in unfinished and not self.params.sync_options.is_details_from_ticket_events:
+            unfinished.update(("ticket_comments_raw", "ticket_audits_raw"))
+        return unfinished & self._selected_resources()
+
+    def _save_checkpoint(self, load_from, actual_start, loaded_tables, load_ids):
+        """
+        Saves the database with the progress of the run, a run which does not finish continues from it
+        """
+        checkpoint = dict(actual_start=actual_start, load_from=load_from, resources=self.resources_state,
+                          loaded_tables=loaded_tables, load_ids=load_ids)
+        self._save_ticket_index(self.pipeline_connection)
+        self.pipeline_connection.execute(f"""CREATE OR REPLACE TABLE {self.dataset_name}.{CHECKPOINT_TABLE} AS
+                                             SELECT ?::VARCHAR AS checkpoint;""", [json.dumps(checkpoint)])
+        self.pipeline_connection.execute("CHECKPOINT;")
+        self.database_store.save(self.duckdb_file)
+        logging.info(f"Saved the checkpoint of the resources {self.resources_state}")
+
+    def _load_checkpoint(self):
+        if not self.database_store or not self._table_exists(CHECKPOINT_TABLE):
+            return None
+        checkpoint = self.pipeline_connection.execute(f"""SELECT checkpoint
+                                                          FROM {self.dataset_name}.{CHECKPOINT_TABLE};""").fetchone()
+        return json.loads(checkpoint[0])
+
+    def _table_exists(self, table):
+        return self.pipeline_connection.execute("""SELECT count(*) FROM duckdb_tables()
+                                                   WHERE schema_name = ? AND table_name = ?;""",
+                                                [self.dataset_name, table]).fetchone()[0] > 0
+
+    def _load_ticket_index(self, actual_start) -> TicketIndex:
+        # the index is kept in the persistent database only, a full sync fetches all ticket details again
+        if not self.database_store or not self.params.sync_options.is_incremental:
+            return TicketIndex(run_start=actual_start)
+        if not self._table_exists(TICKET_INDEX_TABLE):
+            return TicketIndex(run_start=actual_start)
+        committed_runs = self._committed_run_filter("run_start", actual_start, self.committed_start)
+        rows = self.pipeline_connection.execute(f"""SELECT ticket_id, comment_count, updated_at, run_start
+                                                    FROM {self.dataset_name}.{TICKET_INDEX_TABLE}
+                                                    WHERE {committed_runs};""").fetchall()
+        logging.info(f"Loaded the details index of {len(rows)} tickets")
+        return TicketIndex(rows, run_start=actual_start)
+
+    def _save_ticket_index(self, connection):
+        # the index is saved with the data it describes, see _committed_run_filter for the entries the next runs use
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", delete=False) as index_file:
+            csv.writer(index_file).writerows(self.ticket_index.rows())
+        try:
+            connection.execute(f"""CREATE OR REPLACE TABLE {self.dataset_name}.{TICKET_INDEX_TABLE} AS
+                SELECT * FROM read_csv('{index_file.name}', header = false, auto_detect = false,
+                    columns = {{'ticket_id': 'BIGINT', 'comment_count': 'BIGINT', 'updated_at': 'VARCHAR',
+                                'run_start': 'BIGINT'}});""")
+        finally:
+            os.remove(index_file.name)
+
+    def _prepare_views(self, loaded_tables, load_ids, actual_start):
         logging.info("Preparing output views")
-        # set the database
-        self.connection.execute(f"USE {self.dataset_name};")
+        # the output views are created in their own schema over views of the loaded raw tables
+        self.connection.execute(f"DROP SCHEMA IF EXISTS {EXPORT_SCHEMA} CASCADE;")
+        self.connection.execute(f"CREATE SCHEMA {EXPORT_SCHEMA};")
+        self.connection.execute(f"USE {EXPORT_SCHEMA};")
+
+        # the persistent database holds all rows, an incremental load exports only the rows of this run
+        delta_only = self.database_store is not None and self.params.destination.is_incremental_load_type
+        load_filter = f"_dlt_load_id IN ({', '.join(repr(i) for i in load_ids)})" if delta_only else "true"
+        for table in set(loaded_tables):
+            self.connection.execute(f"""CREATE VIEW {table} AS
+                                        SELECT * FROM {self.dataset_name}.{table} WHERE {load_filter};""")
 
         # create output views
         prepared_views = []
-        for view in zendesk_mapping.views:
+        for view in self.views:
             # if is created all tables for view
             if all(t in loaded_tables for t in view.source_tables):
                 logging.info(f"Creating output view {view.name}")
                 self.connection.execute(view.query)
+                if self.params.destination.changed_rows_only and view.primary_key:
+                    self._filter_unchanged_rows(view, actual_start)
                 prepared_views.append(view)
             else:
                 logging.info(f"View {view.name} was not created due to missing tables probably due to an filter ")
         return prepared_views
 
+    def _filter_unchanged_rows(self, view, actual_start):
+        """
+        Replaces the view by the rows whose primary key was not exported yet or whose hash changed since
+        """
+        row_hashes = f"{self.dataset_name}.{view.name}{ROW_HASHES_SUFFIX}"
+        primary_key = ", ".join(view.primary_key)
+        self.connection.execute(f"ALTER VIEW {view.name} RENAME TO {view.name}_rows;")
+        self.connection.execute(f"""CREATE TABLE IF NOT EXISTS {row_hashes} AS
+                                    SELECT {primary_key}, hash(r) AS _row_hash, NULL::BIGINT AS run_start
+                                    FROM {view.name}_rows r LIMIT 0;""")
+        # the hashes saved before the runs were recorded are not trusted, their rows are exported once more
+        self.connection.execute(f"ALTER TABLE {row_hashes} ADD COLUMN IF NOT EXISTS run_start BIGINT;")
+        committed_runs = self._committed_run_filter("h.run_start", actual_start, self.committed_start)
+        same_key = " AND ".join(f"h.{column} IS NOT DISTINCT FROM r.{column}" for column in view.primary_key)
+        self.connection.execute(f"""CREATE VIEW {view.name} AS
+                                    SELECT * EXCLUDE (_row_hash)
+                                    FROM (SELECT *, hash(r) AS _row_hash FROM {view.name}_rows r) r
+                                    WHERE NOT EXISTS (SELECT 1 FROM {row_hashes} h
+                                                      WHERE {same_key} AND h._row_hash = r._row_hash
+                                                      AND {committed_runs});""")
+
+    def _save_row_hashes(self, views, actual_start):
+        # saved once all views were exported, see _committed_run_filter for the hashes the next runs use
+        for view in filter(lambda v: v.primary_key, views):
+            row_hashes = f"{self.dataset_name}.{view.name}{ROW_HASHES_SUFFIX}"
+            same_key = " AND ".join(f"h.{column} IS NOT DISTINCT FROM r.{column}" for column in view.primary_key)
+            self.connection.execute(f"""DELETE FROM {row_hashes} h
+                                        USING {EXPORT_SCHEMA}.{view.name}_rows r WHERE {same_key};""")
+            self.connection.execute(f"""INSERT INTO {row_hashes}
+                                        SELECT {", ".join(view.primary_key)}, hash(r), ?
+                                        FROM {EXPORT_SCHEMA}.{view.name}_rows r;""", [actual_start])
+
     def _export_views(self, views):
-        logging.info("Exporting views to CSV")
-        for view in views:
-            # get the schema of the view
-            table_meta = self.connection.execute(f"""DESCRIBE {view.name};""").fetchall()
-            schema = OrderedDict(
-                (c[0], ColumnDefinition(data_types=BaseType(dtype=self.convert_base_types(c[1])))) for c in table_meta)
-
-            # prepare the out table
-            out_table = self.create_out_table_definition(f"{view.name}.csv",
-                                                         schema=schema,
-                                                         primary_key=view.primary_key,
-                                                         incremental=self.params.destination.is_incremental_load_type,
-                                                         destination=".".join(
-                                                             filter(None, [self.params.destination.destination_bucket,
-                                                                           view.name])),
-                                                         has_header=True,
-                                                         )
-            # export the view
-            logging.info(f"Exporting view {view.name}")
-            try:
-                # ../data/out/tables/{view.name}.csv
-                export_query = f"""COPY '{view.name}' TO '{out_table.full_path}'
-                                                (HEADER false, DELIMITER ',', FORCE_QUOTE *)"""
-                self.connection.execute(export_query)
-            except duckdb.ConversionException as e:
-                raise Exception(f"Error during query execution: {e}")
-
-            # write the manifest
-            self.write_manifest(out_table)
+        logging.info(f"Exporting views to {self.params.destination.output_format.upper()}")
+        # the largest views are started first, the small ones fill in the remaining workers
+        source_sizes = dict(self.connection.execute(f"""SELECT table_name, estimated_size FROM duckdb_tables()
+                                                         WHERE schema_name = '{self.dataset_name}';""").fetchall())
+        views = sorted(views, key=lambda v: sum(source_sizes.get(t, 0) for t in v.source_tables), reverse=True)
+
+        with ThreadPoolExecutor(max_workers=self.params.performance.export_workers) as executor:
+            # list() re-raises the first failed export
+            list(executor.map(self._export_view, views))
+
+    def _export_view(self, view):
+        # every export runs on its own cursor of the shared database
+        cursor = self.connection.cursor()
+        cursor.execute(f"USE {EXPORT_SCHEMA};")
+        started = time.perf_counter()
+        try:
+            if self.params.destination.is_parquet_output:
+                out_path = self._export_view_to_parquet(cursor, view)
+            else:
+                out_path = self._export_view_to_csv(cursor, view)
+        finally:
+            cursor.close()
+        self.metrics.add_view(view.name, time.perf_counter() - started, self._get_size(out_path))
+
+    @staticmethod
+    def _get_size(path: str) -> int:
+        # a sliced table is a folder of CSV files
+        if os.path.isdir(path):
+            return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        return os.path.getsize(path)
+
+    def _export_view_to_csv(self, cursor, view):
+        # get the schema of the view
+        table_meta = cursor.execute(f"""DESCRIBE {view.name};""").fetchall()
+        schema = OrderedDict(
+            (c[0], ColumnDefinition(data_types=BaseType(dtype=self.convert_base_types(c[1])))) for c in table_meta)
+
+        # prepare the out table, a sliced table is a folder of CSV files without header
+        sliced = self.params.destination.sliced_output
+        out_table = self.create_out_table_definition(f"{view.name}.csv",
+                                                     is_sliced=sliced,
+                                                     schema=schema,
+                                                     primary_key=view.primary_key,
+                                                     incremental=self.params.destination.is_incremental_load_type,
+                                                     destination=".".join(
+                                                         filter(None, [self.params.destination.destination_bucket,
+                                                                       view.name])),
+                                                     has_header=not sliced,
+                                                     )
+        # export the view
+        logging.info(f"Exporting view {view.name}")
+        try:
+            # ../data/out/tables/{view.name}.csv or ../data/out/tables/{view.name}.csv/slice_{i}.csv[.gz]
+            export_options = "HEADER false, DELIMITER ',', FORCE_QUOTE *"
+            if sliced:
+                export_options += f""", FILE_SIZE_BYTES {self.params.destination.slice_size_mb * 1024 * 1024},
+                                     FILENAME_PATTERN 'slice_{{i}}'"""
+                if self.params.destination.compress_output:
+                    export_options += ", COMPRESSION gzip, FILE_EXTENSION 'csv.gz'"
+            export_query = f"""COPY '{view.name}' TO '{out_table.full_path}'
+                                            ({export_options})"""
+            cursor.execute(export_query)
+        except duckdb.ConversionException as e:
+            raise Exception(f"Error during query execution: {e}")
+
+        # write the manifest
+        self.write_manifest(out_table)
+        return out_table.full_path
+
+    def _export_view_to_parquet(self, cursor, view):
+        # Storage tables are imported from CSV only, the Parquet output goes to the file storage
+        tags = [PARQUET_FILE_TAG, view.name, self.params.destination.destination_bucket]
+        out_file = self.create_out_file_definition(f"{view.name}.parquet", tags=list(filter(None, tags)))
+        # export the view
+        logging.info(f"Exporting view {view.name}")
+        try:
+            # ../data/out/files/{view.name}.parquet
+            export_query = f"""COPY '{view.name}' TO '{out_file.full_path}' (FORMAT PARQUET, COMPRESSION ZSTD)"""
+            cursor.execute(export_query)
+        except duckdb.ConversionException as e:
+            raise Exception(f"Error during query execution: {e}")
+
+        # write the manifest
+        self.write_manifest(out_file)
+        return out_file.full_path
+
+    def _write_metrics(self):
+        self.metrics.log_summary()
+        self.metrics.write_json(os.path.join(self.data_folder_path, RUN_METRICS_ARTIFACT))
+        if not self.params.performance.run_metrics_table:
+            return
+
+        out_table = self.create_out_table_definition(f"{RUN_METRICS_TABLE}.csv",
+                                                     primary_key=RUN_METRICS_COLUMNS[:-1],
+                                                     incremental=True,
+                                                     destination=".".join(
+                                                         filter(None, [self.params.destination.destination_bucket,
+                                                                       RUN_METRICS_TABLE])),
+                                                     )
+        with open(out_table.full_path, "w", newline="") as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+            writer.writerow(RUN_METRICS_COLUMNS)
+            writer.writerows(self.metrics.rows())
+        self.write_manifest(out_table)
 
     @staticmethod
     def convert_base_types(dtype: str) -> SupportedDataTypes:
@@ -208,7 +611,13 @@ class Component(ComponentBase):
 
     def _init_connection(self, duck_db_file):
         logging.debug(f"Initializing connection to DuckDB database {duck_db_file}")
-        self.connection = duckdb.connect(duck_db_file)
+        self.connection = duckdb.connect(duck_db_file, config=self.duckdb_config)
+
+    def _init_database_store(self) -> DatabaseStore:
+        if not self._get_storage_token():
+            raise UserException("The persistent database requires the Storage API token")
+        tag = f"{self.environment_variables.component_id}-{self.environment_variables.config_id}-database"
+        return DatabaseStore(self._get_kbc_root_url(), self._get_storage_token(), tag)
 
     def _get_kbc_root_url(self):
         return f'https://{self.environment_variables.stack_id}'
@@ -1,4 +1,5 @@
 import logging
+from typing import List, Optional
 
 from pydantic import BaseModel, Field, ValidationError, computed_field
 from keboola.component.exceptions import UserException
@@ -12,31 +13,73 @@ class Authentication(BaseModel):
 
 class SyncOptions(BaseModel):
     sync_mode: str
+    details_source: str = Field(default="ticket_endpoints")
+    sideload_ticket_entities: bool = Field(default=False)
 
     @computed_field
     def is_incremental(self) -> bool:
         return self.sync_mode == "incremental_sync"
 
+    @computed_field
+    def is_details_from_ticket_events(self) -> bool:
+        return self.details_source == "ticket_events"
+
+    @computed_field
+    def is_sideloading_ticket_entities(self) -> bool:
+        # a full sync exports all users, groups and organizations, not only those of the tickets
+        return self.sideload_ticket_entities and self.is_incremental
+
 
 class Destination(BaseModel):
     load_type: str
     destination_bucket: str = Field(default=None)
+    output_format: str = Field(default="csv")
+    sliced_output: bool = Field(default=False)
+    slice_size_mb: int = Field(default=256, ge=1)
+    compress_output: bool = Field(default=False)
+    changed_rows_only: bool = Field(default=False)
+    # names of the output tables, all of them when empty
+    output_tables: List[str] = Field(default_factory=list)
 
     @computed_field
     def is_incremental_load_type(self) -> bool:
         return self.load_type == "incremental_load"
 
+    @computed_field
+    def is_parquet_output(self) -> bool:
+        return self.output_format == "parquet"
+
 
 class AvailableDetails(BaseModel):
     ticket_comments_raw: bool
     ticket_audits_raw: bool
 
 
+class Performance(BaseModel):
+    ticket_details_concurrency: int = Field(default=10, ge=1)
+    prefetch_pages: int = Field(default=1, ge=0)
+    backfill_windows: int = Field(default=1, ge=1)
+    persistent_database: bool = Field(default=False)
+    export_workers: int = Field(default=4, ge=1)
+    arrow_extraction: bool = Field(default=False)
+    run_metrics_table: bool = Field(default=False)
+    cache_reference_endpoints: bool = Field(default=False)
+    # pages of the tickets and users exports loaded between two checkpoints, 0 disables the checkpoints
+    checkpoint_pages: int = Field(default=0, ge=0)
+    # sized by the container limits when not set
+    extract_workers: Optional[int] = Field(default=None, ge=1)
+    normalize_workers: Optional[int] = Field(default=None, ge=1)
+    load_workers: Optional[int] = Field(default=None, ge=1)
+    duckdb_threads: Optional[int] = Field(default=None, ge=1)
+    duckdb_memory_limit_mb: Optional[int] = Field(default=None, ge=128)
+
+
 class Configuration(BaseModel):
     authentication: Authentication
     sync_options: SyncOptions
     destination: Destination
     available_details: AvailableDetails
+    performance: Performance = Field(default_factory=Performance)
     debug: bool = Field(default=False)
 
     def __init__(self, **data):
@@ -0,0 +1,50 @@
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+
+from kbcstorage.files import Files
+
+
+class DatabaseStore:
+    """
+    Keeps the DuckDB database file between runs in the Keboola file storage.
+    The latest file with the store tag is restored at the start and replaced by the new one at the end of a run.
+    """
+
+    def __init__(self, root_url: str, token: str, tag: str):
+        self.files = Files(root_url, token)
+        self.tag = tag
+
+    def restore(self, database_file: str) -> bool:
+        """
+        Downloads the latest stored database to the given path.
+
+        Returns:
+            True if the database was restored, False if no database was stored yet
+        """
+        stored_files = self.files.list(tags=[self.tag], limit=1)
+        if not stored_files:
+            logging.info("No stored database found, the run starts with an empty database")
+            return False
+
+        logging.info(f"Restoring the database from the file {stored_files[0]['id']}")
+        with tempfile.TemporaryDirectory() as download_dir:
+            downloaded_file = self.files.download(stored_files[0]["id"], download_dir)
+            with gzip.open(downloaded_file, "rb") as f_in, open(database_file, "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out)
+        return True
+
+    def save(self, database_file: str) -> None:
+        """
+        Uploads the database compressed and removes the previously stored versions.
+        """
+        previous_files = self.files.list(tags=[self.tag])
+        logging.info(f"Saving the database {os.path.getsize(database_file)} bytes")
+        file_id = self.files.upload_file(database_file, tags=[self.tag], is_permanent=True, compress=True)
+        os.remove(f"{database_file}.gz")
+
+        for previous_file in previous_files:
+            if previous_file["id"] != file_id:
+                self.files.delete(previous_file["id"])
@@ -1,128 +1,528 @@
 import logging
-from typing import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type
 
 import dlt
 import pendulum
 
-from dlt.common.typing import TDataItem
+from dlt.common.libs.pydantic import BaseModel, pydantic_to_table_schema_columns
+from dlt.common.typing import TDataItem, TDataItems
 from dlt.sources import DltResource
 
 from .helpers.credentials import TZendeskCredentials
-from .helpers.api_client import ZendeskAPIClient, PaginationType
+from .helpers.api_client import ZendeskAPIClient, PaginationType, merge_iterators
+from .helpers.metrics import RequestMetrics
+from .helpers.rate_limiter import RateLimiter
+from .helpers.sideloads import Sideloads
+from .helpers.ticket_index import TicketIndex
 
 from .zendesk_objects import (Tags, Tickets, TicketComments, TicketAudits, Users, Groups, GroupMembership,
                               Organizations,
                               TicketsFields)
 
+# keys of the resource states (watermarks and cursors) kept between runs and the resources they belong to
+WATERMARK_RESOURCES = {
+    "tickets": "tickets_raw",
+    "users": "users_raw",
+    "organizations": "organizations_raw",
+    "ticket_comments": "ticket_comments_raw",
+    "ticket_audits": "ticket_audits_raw",
+}
+TICKET_DETAILS = ("ticket_comments", "ticket_audits")
+# entities which the tickets export can sideload and their models, their tables are named `{entity}_raw`
+SIDELOADED_ENTITIES = {"users": Users, "groups": Groups, "organizations": Organizations}
+# the backfill windows meet at their borders, only the items changed this close to a border can be read twice
+WINDOW_BORDER_SECONDS = 60
+
 
 @dlt.source(max_table_nesting=0)
-def zendesk_support(start_date_iso: int, credentials: TZendeskCredentials = dlt.secrets.value) \
-        -> Iterable[DltResource]:
+def zendesk_support(start_date_iso: int, details_from_ticket_events: bool = False, details_concurrency: int = 10,
+                    details_executor: Optional[ThreadPoolExecutor] = None,
+                    prefetch_pages: int = 1, arrow_extraction: bool = False, backfill_windows: int = 1,
+                    sideload_ticket_entities: bool = False,
+                    state: Optional[Dict[str, Any]] = None,
+                    url_prefix: Optional[str] = None, metrics: Optional[RequestMetrics] = None,
+                    ticket_index: Optional[TicketIndex] = None,
+                    response_cache: Optional[Dict[str, Dict[str, Any]]] = None,
+                    max_pages: Optional[int] = None,
+                    rate_limiter: Optional[RateLimiter] = None,
+                    credentials: TZendeskCredentials = dlt.secrets.value) -> Iterable[DltResource]:
+    """
+    Zendesk Support source
+
+    Args:
+        start_date_iso: Timestamp of the oldest changes to load for resources without their own watermark
+        details_from_ticket_events: Read comments and audits from the ticket events export instead of per ticket
+        details_concurrency: Number of tickets whose details are fetched at the same time
+        details_executor: Optional pool fetching the ticket details shared by several extractions, e.g. the checkpoint
+        rounds of a run, it replaces `details_concurrency` and is shut down by the caller
+        prefetch_pages: Number of pages of the incremental exports read ahead by the API client
+        arrow_extraction: Yield the pages as Arrow tables built from the object models, dlt then loads them
+        without the per row validation and normalization. Requires pyarrow
+        backfill_windows: Number of time windows of the tickets export fetched at the same time when it does not
+        continue from a cursor, e.g. in a full sync
+        sideload_ticket_entities: Read the users, groups and organizations of the exported tickets from the
+        sideloads of the tickets export instead of their own exports, which are left out
+        state: Resource states of the previous run keyed by WATERMARK_RESOURCES, i.e. the `start_time` watermark
+        and export cursors. Only the states of the selected resources are passed. The dict is updated in place
+        during the extraction, so it holds the states to persist once the run succeeds
+        url_prefix: Optional API URL replacing the one of the subdomain, e.g. a local mock server
+        metrics: Optional request statistics filled by the API client during the extraction
+        ticket_index: Comment counts and update times of the tickets whose details were fetched by the previous
+        runs, the tickets without new comments or audits are skipped. Updated in place like the state
+        response_cache: Optional ETags and content hashes of the reference endpoints keyed by the resource,
+        e.g. groups. An endpoint unchanged since the cached response yields no data. Updated in place like the state
+        max_pages: Optional number of pages read by the cursor based tickets and users exports. An export stopped
+        before the end of its stream keeps `end_of_stream` false in its state and the next extraction with the same
+        state continues from its cursor. The backfill windows are not used then
+        rate_limiter: Optional scheduler shared by several extractions, e.g. the checkpoint rounds of a run
+    """
+    state = {} if state is None else state
+    ticket_index = TicketIndex() if ticket_index is None else ticket_index
+
+    def start_time(resource: str) -> int:
+        return state.get(resource, {}).get("start_time", start_date_iso)
+
+    def columns(model: Type[BaseModel], validated: bool = True) -> Any:
+        # the pydantic validation only accepts dict items of the resource table, Arrow tables and resources
+        # yielding table variants get the column hints of the model
+        return model if validated and not arrow_extraction else pydantic_to_table_schema_columns(model)
+
+    def pages(items: Iterable[List[TDataItem]], model: Type[BaseModel], validate: bool = False) \
+            -> Iterator[TDataItems]:
+        if not arrow_extraction:
+            # items of a resource without the pydantic validation are validated by the model one by one
+            for page in items:
+                yield [model(**item).model_dump(by_alias=True) for item in page] if validate else page
+            return
+        # pyarrow is optional, the helper is only imported when the Arrow extraction is used
+        from .helpers.arrow import arrow_schema, page_to_arrow
+        schema = arrow_schema(model)
+        for page in items:
+            if page:
+                yield page_to_arrow(page, model, schema)
+
+    def sideloaded(sideloads: Sideloads) -> Iterator[TDataItems]:
+        for entity, items in sideloads.pop():
+            model = SIDELOADED_ENTITIES[entity]
+            # merged by the id, an entity sideloaded by several runs keeps one row in the persistent database
+            hints = dlt.mark.make_hints(table_name=f"{entity}_raw", columns=pydantic_to_table_schema_columns(model),
+                                        primary_key="id", write_disposition="merge")
+            for page in pages([items], model, validate=True):
+                yield dlt.mark.with_hints(page, hints, create_table_variant=True)
+
     supported_endpoints = [
-        ("groups", "/api/v2/groups.json", Groups),
-        ("group_memberships", "/api/v2/group_memberships.json", GroupMembership),
-        ("tags", "/api/v2/tags.json", Tags),
-        ("ticket_fields", "/api/v2/ticket_fields.json", TicketsFields),
+        ("groups", "/api/v2/groups.json", Groups, "id"),
+        ("group_memberships", "/api/v2/group_memberships.json", GroupMembership, "id"),
+        ("tags", "/api/v2/tags.json", Tags, "name"),
+        ("ticket_fields", "/api/v2/ticket_fields.json", TicketsFields, "id"),
     ]
 
-    @dlt.resource(name="organizations_raw", parallelized=True, columns=Organizations, write_disposition="replace")
+    @dlt.resource(name="organizations_raw", parallelized=True, columns=columns(Organizations),
+                  write_disposition="replace", primary_key="id")
     def organizations() -> Iterator[TDataItem]:
-        dt = pendulum.from_timestamp(start_date_iso)
-        from_date = dt.format('YYYY-MM-DD')
-
         logging.info("Loading Organizations")
-        user_pages = zendesk_client.get_pages(
-            "/api/v2/search.json",
-            "results",
-            PaginationType.OFFSET,
-            params={"query": f"type:organization updated>{from_date}"},
+        # the organizations repeated at the page boundaries are dropped
+        organization_pages = _stream_pages(
+            zendesk_client,
+            "/api/v2/incremental/organizations.json",
+            "organizations",
+            params={"start_time": start_time("organizations")},
+            change_time=_change_time,
         )
-        yield from user_pages
+        yield from pages(organization_pages, Organizations)
 
-    @dlt.resource(name="users_raw", parallelized=True, columns=Users, write_disposition="replace")
+    @dlt.resource(name="users_raw", parallelized=True, columns=columns(Users), write_disposition="replace",
+                  primary_key="id")
     def users() -> Iterator[TDataItem]:
-        dt = pendulum.from_timestamp(start_date_iso)
-        from_date = dt.format('YYYY-MM-DD')
-
         logging.info("Loading users")
+        users_state = state.setdefault("users", {})
+        # continue exactly after the last user of the previous run when its cursor is known
+        if users_state.get("after_cursor"):
+            params = {"cursor": users_state["after_cursor"]}
+        else:
+            params = {"start_time": start_time("users")}
+
         user_pages = zendesk_client.get_pages(
-            "/api/v2/users/search.json",
+            "/api/v2/incremental/users/cursor.json",
             "users",
-            PaginationType.OFFSET,
-            params={"query": f"type:user updated>{from_date}"},
+            PaginationType.STREAM_CURSOR,
+            params=params,
+            on_response=lambda response: _store_cursor(users_state, response),
+            max_pages=max_pages,
+            read_ahead=True,
         )
-        yield from user_pages
+        yield from pages(user_pages, Users)
 
-    @dlt.resource(name="tickets_raw", parallelized=True, columns=Tickets, write_disposition="replace")
+    @dlt.resource(name="tickets_raw", parallelized=True, columns=columns(Tickets, not sideload_ticket_entities),
+                  write_disposition="replace", primary_key="id")
     def ticket_table() -> Iterator[TDataItem]:
         logging.info("Loading tickets")
-        ticket_pages = zendesk_client.get_pages(
-            "/api/v2/incremental/tickets.json",
-            "tickets",
-            PaginationType.STREAM,
-            params={"include": "metric_sets,comment_count",
-                    "start_time": start_date_iso},
-        )
-        yield from ticket_pages
+        tickets_state = state.setdefault("tickets", {})
+        sideloads = Sideloads(SIDELOADED_ENTITIES if sideload_ticket_entities else [])
+        params = {"include": "metric_sets,comment_count"}
+        if sideload_ticket_entities:
+            params["include"] += "," + ",".join(SIDELOADED_ENTITIES)
+        # the per ticket details are fed by this export, so it has to start at the oldest of their watermarks
+        details = [] if details_from_ticket_events else [start_time(d) for d in TICKET_DETAILS if d in state]
+        stream_start = min([start_time("tickets"), *details])
+        # continue exactly after the last ticket of the previous run when its cursor is known,
+        # an export stopped at the page limit always continues from its cursor
+        unfinished = tickets_state.get("end_of_stream") is False
+        if tickets_state.get("after_cursor") and (stream_start >= start_time("tickets") or unfinished):
+            params["cursor"] = tickets_state["after_cursor"]
+        else:
+            params["start_time"] = stream_start
+
+        def on_response(response: Dict[str, Any]) -> None:
+            _store_cursor(tickets_state, response)
+            sideloads.collect(response)
 
-    @dlt.transformer(name="ticket_comments_raw", parallelized=True, columns=TicketComments)
-    def ticket_comments(tickets: Iterator[TDataItem]):
+        if "start_time" in params and backfill_windows > 1 and not max_pages:
+            ticket_pages = _windowed_pages(
+                zendesk_client,
+                "/api/v2/incremental/tickets/cursor.json",
+                "tickets",
+                params,
+                backfill_windows,
+                on_response=lambda response: _store_cursor(tickets_state, response),
+                on_window_response=sideloads.collect,
+            )
+        else:
+            ticket_pages = zendesk_client.get_pages(
+                "/api/v2/incremental/tickets/cursor.json",
+                "tickets",
+                PaginationType.STREAM_CURSOR,
+                params=params,
+                on_response=on_response,
+                max_pages=max_pages,
+                read_ahead=True,
+            )
+        # the sideloads of a page are collected once the page was processed, so they follow it
+        for page in pages(ticket_pages, Tickets, validate=sideload_ticket_entities):
+            yield page
+            yield from sideloaded(sideloads)
+        yield from sideloaded(sideloads)
+
+    @dlt.transformer(name="ticket_comments_raw", primary_key="id", parallelized=True, columns=columns(TicketComments))
+    def ticket_comments(tickets: Iterator[TDataItem], meta: Any = None):
+        # the entities sideloaded by the tickets export come as items of their table variants
+        if meta is not None:
+            return
         logging.info("Loading ticket comments")
-        for ticket in tickets:
-            # try if page not found write to log
-            try:
-                comment_pages = zendesk_client.get_pages(
-                    f"/api/v2/tickets/{ticket['id']}/comments.json",
-                    "comments",
-                    PaginationType.CURSOR,
-                )
-                for comments in comment_pages:
-                    yield [dict(ticket_id=ticket['id'], **i) for i in comments]
-            except Exception as e:
-                logging.warning(f"Ticket {ticket['id']} comments not found {e}")
-
-    @dlt.transformer(name="ticket_audits_raw", parallelized=True, columns=TicketAudits)
-    def ticket_audits(tickets: Iterator[TDataItem]):
+        tickets = _rows(tickets, ("id", "updated_at", "comment_count"))
+        tickets = _updated_since(tickets, "updated_at", start_time("ticket_comments"))
+        tickets = [ticket for ticket in tickets if ticket_index.has_new_comments(ticket)]
+        comments = _ticket_details(zendesk_client, tickets, "comments", details_executor,
+                                   on_fetched=ticket_index.comments_fetched)
+        yield from pages([[dict(ticket_id=ticket_id, **comment) for ticket_id, comment in comments]], TicketComments)
+
+    @dlt.transformer(name="ticket_audits_raw", primary_key="id", parallelized=True, columns=columns(TicketAudits))
+    def ticket_audits(tickets: Iterator[TDataItem], meta: Any = None):
+        if meta is not None:
+            return
         logging.info("Loading ticket audits")
-        for ticket in tickets:
-            try:
-                audit_pages = zendesk_client.get_pages(
-                    f"/api/v2/tickets/{ticket['id']}/audits.json",
-                    "audits",
-                    PaginationType.CURSOR,
-                )
-                for audits in audit_pages:
-                    yield audits
-            except Exception as e:
-                logging.warning(f"Ticket {ticket['id']} audits not found {e}")
+        tickets = _rows(tickets, ("id", "updated_at"))
+        tickets = _updated_since(tickets, "updated_at", start_time("ticket_audits"))
+        tickets = [ticket for ticket in tickets if ticket_index.has_new_audits(ticket)]
+        audits = _ticket_details(zendesk_client, tickets, "audits", details_executor,
+                                 on_fetched=ticket_index.audits_fetched)
+        yield from pages([[audit for _, audit in audits]], TicketAudits)
+
+    @dlt.resource(name="ticket_events", selected=False)
+    def ticket_events() -> Iterator[TDataItem]:
+        logging.info("Loading ticket events")
+        # an event never changes once created, so the events repeated at the page boundaries are dropped
+        yield from _stream_pages(
+            zendesk_client,
+            "/api/v2/incremental/ticket_events.json",
+            "ticket_events",
+            params={"include": "comment_events",
+                    "start_time": min([start_time(d) for d in TICKET_DETAILS if d in state] or [start_date_iso])},
+            change_time=lambda event: event["timestamp"],
+        )
+
+    @dlt.transformer(name="ticket_comments_raw", primary_key="id", parallelized=True, columns=columns(TicketComments))
+    def ticket_event_comments(events: Iterator[TDataItem]):
+        events = _updated_since(events, "timestamp", start_time("ticket_comments"))
+        comments = [comment for event in events for comment in _event_comments(event)]
+        if comments:
+            yield from pages([comments], TicketComments)
+
+    @dlt.transformer(name="ticket_audits_raw", primary_key="id", parallelized=True, columns=columns(TicketAudits))
+    def ticket_event_audits(events: Iterator[TDataItem]):
+        events = _updated_since(events, "timestamp", start_time("ticket_audits"))
+        yield from pages([[_event_audit(event) for event in events]], TicketAudits)
 
     # Authenticate
-    zendesk_client = ZendeskAPIClient(credentials)
+    zendesk_client = ZendeskAPIClient(credentials, url_prefix=url_prefix, rate_limiter=rate_limiter,
+                                      prefetch_pages=prefetch_pages, metrics=metrics)
+    # dlt runs the pages of the ticket details transformers in several workers, they all share one pool, so the
+    # comments and audits of at most `details_concurrency` tickets are fetched at the same time
+    if details_executor is None:
+        details_executor = ThreadPoolExecutor(max_workers=details_concurrency, thread_name_prefix="ticket_details")
 
-    # loading base tables
+    # loading base tables, the sideloaded entities come with the tickets
     resource_list = [
         organizations,
         users,
         ticket_table,
-        ticket_table | ticket_comments,
-        ticket_table | ticket_audits
     ]
+    if sideload_ticket_entities:
+        resource_list = [ticket_table]
+    # ticket details are read either per ticket or in bulk from the ticket events export
+    if details_from_ticket_events:
+        resource_list += [
+            ticket_events | ticket_event_comments,
+            ticket_events | ticket_event_audits
+        ]
+    else:
+        resource_list += [
+            ticket_table | ticket_comments,
+            ticket_table | ticket_audits
+        ]
     # other tables to be loaded
-    for resource, endpoint_url, columns in list(supported_endpoints):
+    for resource, endpoint_url, model, primary_key in list(supported_endpoints):
+        if sideload_ticket_entities and resource in SIDELOADED_ENTITIES:
+            continue
+        cache = response_cache.setdefault(resource, {}) if response_cache is not None else None
         resource_list.append(
-            dlt.resource(_basic_resource(zendesk_client, endpoint_url, resource), name=f"{resource}_raw",
-                         columns=columns,
+            dlt.resource(pages(_basic_resource(zendesk_client, endpoint_url, resource, cache), model),
+                         name=f"{resource}_raw",
+                         columns=columns(model),
+                         primary_key=primary_key,
+                         write_disposition="replace",
                          parallelized=True, )
         )
     return resource_list
 
 
-def _basic_resource(zendesk_client: ZendeskAPIClient, endpoint_url: str, data_key: str) -> \
-        Iterator[TDataItem]:
+def _basic_resource(zendesk_client: ZendeskAPIClient, endpoint_url: str, data_key: str,
+                    cache: Optional[Dict[str, Any]] = None) -> Iterator[TDataItem]:
     logging.info(f"Loading {data_key}")
+    if cache is not None:
+        pages = zendesk_client.get_pages_if_changed(endpoint_url, data_key, PaginationType.CURSOR, cache)
+        if pages is None:
+            logging.info(f"{data_key} unchanged since the last run, skipped")
+        yield from pages or []
+        return
     pages = zendesk_client.get_pages(
         endpoint_url,
         data_key,
         PaginationType.CURSOR,
     )
     yield from pages
+
+
+def _store_cursor(resource_state: Dict[str, Any], response: Dict[str, Any]) -> None:
+    """
+    Remembers the cursor of a cursor based incremental export, the next run continues right after it
+    """
+    if response.get("after_cursor"):
+        resource_state["after_cursor"] = response["after_cursor"]
+    resource_state["end_of_stream"] = response.get("end_of_stream")
+
+
+def _stream_pages(zendesk_client: ZendeskAPIClient, endpoint: str, data_key: str, params: Dict[str, Any],
+                  change_time: Callable[[TDataItem], int]) -> Iterator[List[TDataItem]]:
+    """
+    Reads a time based incremental export. Each page starts at the `end_time` of the previous one, so the items
+    changed at that time are served again. Only the ids and change times of these items of the previous page are
+    kept to drop the repeated ones, an item changed again since comes with its new change time and is kept.
+    """
+    end_times: List[int] = []
+    stream_pages = zendesk_client.get_pages(endpoint, data_key, PaginationType.STREAM, params=params,
+                                            on_response=lambda response: end_times.append(response["end_time"]),
+                                            read_ahead=True)
+    previous_page: List[TDataItem] = []
+    for page in stream_pages:
+        # the response of the previous page is passed on once the next page was requested
+        end_time = end_times.pop() if end_times else None
+        repeated = {(item["id"], change_time(item)) for item in previous_page
+                    if end_time is not None and change_time(item) >= end_time}
+        previous_page = page
+        yield [item for item in page if (item["id"], change_time(item)) not in repeated] if repeated else page
+
+
+def _windowed_pages(zendesk_client: ZendeskAPIClient, endpoint: str, data_key: str, params: Dict[str, Any],
+                    windows: int, on_response: Callable[[Dict[str, Any]], None],
+                    on_window_response: Optional[Callable[[Dict[str, Any]], None]] = None) \
+        -> Iterator[List[TDataItem]]:
+    """
+    Reads a cursor based incremental export split into time windows which are fetched at the same time.
+    The range starts at the first change found after `start_time`, each window stops at the start of the next one
+    and the last window runs to the end of the stream, so only its responses are passed to `on_response`.
+    The responses of all windows are passed to `on_window_response`, e.g. to collect their sideloads.
+    The first page is the first page of the first window. The items close to the window borders are de-duplicated
+    by their id and updated_at.
+    """
+    starts: List[int] = []
+    stops: List[Optional[int]] = []
+
+    def window_response(window: int) -> Callable[[Dict[str, Any]], None]:
+        def on_window_page(response: Dict[str, Any]) -> None:
+            if on_window_response:
+                on_window_response(response)
+            if stops[window] is None:
+                on_response(response)
+        return on_window_page
+
+    def window_pages(window: int) -> Iterator[List[TDataItem]]:
+        window_params = {**params, "start_time": starts[window]}
+        return zendesk_client.get_pages(endpoint, data_key, PaginationType.STREAM_CURSOR, params=window_params,
+                                        on_response=window_response(window), read_ahead=True)
+
+    # the windows are known once the first page was read, the responses are passed on after that
+    first_pages = zendesk_client.get_pages(endpoint, data_key, PaginationType.STREAM_CURSOR, params=dict(params),
+                                           on_response=window_response(0), read_ahead=True)
+    first_page = next(first_pages, [])
+    if not first_page:
+        first_pages.close()
+        return
+
+    first_time = _change_time(first_page[0])
+    step = max((pendulum.now().int_timestamp - first_time) // windows, 1)
+    starts.extend(first_time + step * window for window in range(windows))
+    stops.extend(starts[1:] + [None])
+    logging.info(f"Loading {data_key} from {pendulum.from_timestamp(first_time)} in {windows} windows of "
+                 f"{pendulum.duration(seconds=step).in_words()}")
+
+    def in_window(window: int, pages: Iterator[List[TDataItem]]) -> Iterator[List[TDataItem]]:
+        window_stop = stops[window]
+        for page in pages:
+            items = [item for item in page if window_stop is None or _change_time(item) < window_stop]
+            if items:
+                yield items
+            # the export is ordered by the change time, the rest belongs to the next window
+            if len(items) < len(page):
+                pages.close()
+                return
+
+    def first_window() -> Iterator[List[TDataItem]]:
+        try:
+            yield first_page
+            yield from first_pages
+        finally:
+            first_pages.close()
+
+    def near_border(item: TDataItem) -> bool:
+        change_time = _change_time(item)
+        return any(abs(change_time - border) <= WINDOW_BORDER_SECONDS for border in starts[1:])
+
+    windows_pages = [in_window(0, first_window())]
+    windows_pages.extend(in_window(window, window_pages(window)) for window in range(1, windows))
+    seen = set()
+    for page in merge_iterators(windows_pages):
+        items = []
+        for item in page:
+            if near_border(item):
+                key = (item["id"], item.get("updated_at"))
+                if key in seen:
+                    continue
+                seen.add(key)
+            items.append(item)
+        if items:
+            yield items
+
+
+def _change_time(item: TDataItem) -> int:
+    """
+    Timestamp an item of an incremental export is ordered by
+    """
+    if item.get("generated_timestamp") is not None:
+        return item["generated_timestamp"]
+    return pendulum.parse(item["updated_at"]).int_timestamp
+
+
+def _rows(items: TDataItems, fields: Sequence[str]) -> List[TDataItem]:
+    """
+    Rows of a page as dicts, a page extracted as an Arrow table is reduced to the given fields first
+    """
+    if isinstance(items, list):
+        return items
+    return items.select(list(fields)).to_pylist()
+
+
+def _updated_since(items: List[TDataItem], field: str, start_time: int) -> List[TDataItem]:
+    """
+    Keeps the items changed at or after the watermark of a resource, the field holds an ISO date or a timestamp
+    """
+    def changed_at(item: TDataItem) -> int:
+        value = item.get(field)
+        if isinstance(value, str):
+            return pendulum.parse(value).int_timestamp
+        return value
+
+    return [item for item in items if item.get(field) is None or changed_at(item) >= start_time]
+
+
+def _ticket_details(zendesk_client: ZendeskAPIClient, tickets: List[TDataItem], data_key: str,
+                    executor: ThreadPoolExecutor, on_fetched: Optional[Callable[[TDataItem], None]] = None) \
+        -> List[Tuple[int, TDataItem]]:
+    """
+    Fetches the comments or audits of a page of tickets through the worker pool shared by all pages.
+    The requests are paced by the rate limiter shared by the client, a ticket without details is skipped.
+    `on_fetched` is called with every ticket whose details were fetched.
+
+    Returns:
+        Batch of (ticket id, detail item) tuples of the whole page in the order of the tickets
+    """
+
+    def fetch(ticket: TDataItem) -> List[TDataItem]:
+        # try if page not found write to log
+        try:
+            pages = zendesk_client.get_pages(
+                f"/api/v2/tickets/{ticket['id']}/{data_key}.json",
+                data_key,
+                PaginationType.CURSOR,
+            )
+            items = [item for page in pages for item in page]
+        except Exception as e:
+            logging.warning(f"Ticket {ticket['id']} {data_key} not found {e}")
+            return []
+        if on_fetched:
+            on_fetched(ticket)
+        return items
+
+    details = executor.map(fetch, tickets)
+    return [(ticket["id"], item) for ticket, items in zip(tickets, details) for item in items]
+
+
+def _event_audit(event: TDataItem) -> TDataItem:
+    """
+    Converts a ticket event of the incremental export to the shape of the ticket audits endpoint
+    """
+    return dict(
+        id=event["id"],
+        ticket_id=event["ticket_id"],
+        events=event.get("child_events", []),
+        author_id=event.get("updater_id"),
+        created_at=event.get("created_at"),
+        metadata={"system": event.get("system", {})},
+        via=event.get("via"),
+    )
+
+
+def _event_comments(event: TDataItem) -> Iterator[TDataItem]:
+    """
+    Extracts the comments of a ticket event in the shape of the ticket comments endpoint
+    """
+    for child in event.get("child_events", []):
+        if child.get("event_type") != "Comment":
+            continue
+        yield dict(
+            id=child["id"],
+            ticket_id=event["ticket_id"],
+            audit_id=event["id"],
+            type=child.get("event_type"),
+            author_id=child.get("author_id", event.get("updater_id")),
+            body=child.get("body"),
+            html_body=child.get("html_body"),
+            plain_body=child.get("plain_body"),
+            public=child.get("public"),
+            attachments=child.get("attachments", []),
+            via=child.get("via", event.get("via")),
+            created_at=child.get("created_at", event.get("created_at")),
+            uploads=child.get("uploads", []),
+            metadata={"system": event.get("system", {})},
+        )
@@ -1,7 +1,13 @@
+import hashlib
+import logging
+import threading
+import time
 from enum import Enum
-from typing import Dict, Iterator, Optional, Tuple, Any
+from queue import Full, Queue
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Any, TypeVar
+from dlt.common import json
 from dlt.common.typing import DictStrStr, TDataItems, TSecretValue
-from dlt.sources.helpers.requests import client
+from dlt.sources.helpers.requests import Client, Response
 
 from .credentials import (
     ZendeskCredentialsEmailPass,
@@ -9,9 +15,20 @@ from .credentials import (
     ZendeskCredentialsToken,
     TZendeskCredentials,
 )
+from .metrics import RequestMetrics
+from .rate_limiter import RateLimiter
 
 PAGE_SIZE = 100
 INCREMENTAL_PAGE_SIZE = 1000
+# 429 is handled by the rate limiter, only server errors and connection issues are retried by the client
+RETRY_STATUS_CODES = tuple(range(500, 600))
+MAX_RATE_LIMIT_RETRIES = 10
+DEFAULT_RETRY_AFTER = 60
+PREFETCH_PAGES = 1
+MAX_CONNECTIONS = 100
+
+T = TypeVar("T")
+_END_OF_ITEMS = object()
 
 
 class PaginationType(Enum):
@@ -19,6 +36,7 @@ class PaginationType(Enum):
     CURSOR = 1
     STREAM = 2
     START_TIME = 3
+    STREAM_CURSOR = 4
 
 
 class ZendeskAPIClient:
@@ -30,9 +48,13 @@ class ZendeskAPIClient:
     url: str = ""
     headers: Optional[DictStrStr]
     auth: Optional[Tuple[str, TSecretValue]]
+    rate_limiter: RateLimiter
+    metrics: RequestMetrics
 
     def __init__(
-            self, credentials: TZendeskCredentials, url_prefix: Optional[str] = None
+            self, credentials: TZendeskCredentials, url_prefix: Optional[str] = None,
+            rate_limiter: Optional[RateLimiter] = None, prefetch_pages: int = PREFETCH_PAGES,
+            max_connections: int = MAX_CONNECTIONS, metrics: Optional[RequestMetrics] = None
     ) -> None:
         """
         Initializer for the API client which is then used to make API calls to the ZendeskAPI
@@ -40,6 +62,11 @@ class ZendeskAPIClient:
         Args:
             credentials: ZendeskCredentials object
             which contains the necessary credentials to authenticate to ZendeskAPI
+            url_prefix: Optional url which overrides the default API URL
+            rate_limiter: Optional scheduler shared with other clients, a new one is created by default
+            prefetch_pages: Number of pages read ahead while the current page is processed, 0 disables the read-ahead
+            max_connections: Size of the keep-alive connection pool
+            metrics: Optional request statistics shared with the caller, a new one is created by default
         """
         # oauth token is the preferred way to authenticate, followed by api token and then email + password combo
         # fill headers and auth for every possibility of credentials given,
@@ -66,12 +93,23 @@ class ZendeskAPIClient:
             self.subdomain = credentials.subdomain
             self.url = f"https://{self.subdomain}.zendesk.com"
 
+        # all resources share this client, so the rate limiter paces the whole account budget
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.prefetch_pages = prefetch_pages
+        self.metrics = metrics or RequestMetrics()
+        # one keep-alive connection pool is shared by the per-thread sessions of all resources
+        self.client = Client(raise_for_status=False, status_codes=RETRY_STATUS_CODES,
+                             max_connections=max_connections)
+
     def get_pages(
             self,
             endpoint: str,
             data_point_name: str,
             pagination: PaginationType,
             params: Optional[Dict[str, Any]] = None,
+            on_response: Optional[Callable[[Dict[str, Any]], None]] = None,
+            max_pages: Optional[int] = None,
+            read_ahead: bool = False,
     ) -> Iterator[TDataItems]:
         """
         Makes a request to a paginated endpoint and returns a generator of data items per page.
@@ -81,43 +119,208 @@ class ZendeskAPIClient:
             data_point_name: The key which data items are nested under in the response object (e.g. calls)
             params: Optional dict of query params to include in the request
             pagination: Type of pagination type used by endpoint
+            on_response: Optional callback called with the whole response object once its page was processed,
+            e.g. to store the cursor of an incremental export
+            max_pages: Optional number of pages after which the reading stops
+            read_ahead: Request the next pages in the background while the current one is processed, meant for
+            the long incremental exports
 
         Returns:
             Generator of pages, each page is a list of dict data items
         """
-        # update the page size to enable cursor pagination
-        params = params or {}
-        if pagination == PaginationType.CURSOR:
-            params["page[size]"] = PAGE_SIZE
-        elif pagination == PaginationType.STREAM:
-            params["per_page"] = INCREMENTAL_PAGE_SIZE
-        elif pagination == PaginationType.START_TIME:
-            params["limit"] = INCREMENTAL_PAGE_SIZE
-
-        # make request and keep looping until there is no next page
+        # the next page is requested in the background while the current one is processed
+        params = _page_params(pagination, params)
+        responses = self._get_responses(f"{self.url}{endpoint}", data_point_name, pagination, params, max_pages)
+        for response_json in _prefetch(responses, self.prefetch_pages if read_ahead else 0):
+            yield response_json[data_point_name]
+            if on_response:
+                on_response(response_json)
+
+    def get_pages_if_changed(
+            self,
+            endpoint: str,
+            data_point_name: str,
+            pagination: PaginationType,
+            cache: Dict[str, Any],
+    ) -> Optional[List[TDataItems]]:
+        """
+        Reads all pages of a small endpoint unless they are unchanged since the cached response.
+        An endpoint read in a single page is requested with the cached `ETag` in `If-None-Match` and is not
+        downloaded again when the server answers 304, otherwise the content hash of the pages is compared.
+
+        Args:
+            endpoint: The url to the endpoint, e.g. /api/v2/groups.json
+            data_point_name: The key which data items are nested under in the response object (e.g. groups)
+            pagination: Type of pagination type used by endpoint
+            cache: The `etag` and `hash` of the previous response, updated in place
+
+        Returns:
+            List of pages, None when the endpoint is unchanged
+        """
         get_url = f"{self.url}{endpoint}"
-        while get_url:
-            response = client.get(
-                url=get_url, headers=self.headers, auth=self.auth, params=params,
-            )
-            response.raise_for_status()
-            response_json = response.json()
-            result = response_json[data_point_name]
-            yield result
-
-            get_url = None
-            if pagination == PaginationType.CURSOR:
-                if response_json["meta"]["has_more"]:
-                    get_url = response_json["links"]["next"]
-            elif pagination == PaginationType.OFFSET:
-                get_url = response_json.get("next_page", None)
-            elif pagination == PaginationType.STREAM:
-                # See
-                # https://developer.zendesk.com/api-reference/ticketing/ticket-management/incremental_exports/#json-format
-                if not response_json["end_of_stream"]:
-                    get_url = response_json["next_page"]
-            elif pagination == PaginationType.START_TIME:
-                if response_json["count"] > 0:
-                    get_url = response_json["next_page"]
+        headers = {"If-None-Match": cache["etag"]} if cache.get("etag") else None
+        response = self._get(get_url, _page_params(pagination), data_point_name, headers=headers)
+        if response.status_code == 304:
+            return None
+
+        first_json = json.loadb(response.content)
+        responses = [first_json]
+        next_url = _next_url(first_json, pagination)
+        if next_url:
+            responses += self._get_responses(next_url, data_point_name, pagination, {})
+        pages = [response_json[data_point_name] for response_json in responses]
+
+        content_hash = hashlib.sha256(json.dumpb(pages, sort_keys=True)).hexdigest()
+        changed = content_hash != cache.get("hash")
+        cache["hash"] = content_hash
+        # the ETag of the first page describes the whole endpoint only when it has no other pages
+        cache["etag"] = response.headers.get("ETag") if len(pages) == 1 else None
+        return pages if changed else None
+
+    def _get_responses(
+            self, get_url: str, data_point_name: str, pagination: PaginationType, params: Dict[str, Any],
+            max_pages: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Makes requests and keeps looping until there is no next page or `max_pages` were read,
+        returns a generator of response objects.
+        """
+        page_number = 0
+        while get_url and page_number != max_pages:
+            response = self._get(get_url, params, data_point_name)
+            # decoded from the raw bytes by orjson, dlt falls back to simplejson when it is not available
+            response_json = json.loadb(response.content)
+            page_number += 1
+            yield response_json
 
+            get_url = _next_url(response_json, pagination)
             params = {}
+
+    def _get(self, url: str, params: Optional[Dict[str, Any]], metrics_key: str,
+             headers: Optional[DictStrStr] = None) -> Response:
+        """
+        Sends a GET request paced by the rate limiter, 429 responses are retried after the `Retry-After` interval.
+        Every attempt is recorded in the request metrics under the given key.
+        """
+        if headers:
+            headers = {**(self.headers or {}), **headers}
+        else:
+            headers = self.headers
+        for _ in range(MAX_RATE_LIMIT_RETRIES):
+            throttled = self.rate_limiter.acquire(url)
+            started = time.perf_counter()
+            response = self.client.get(url=url, headers=headers, auth=self.auth, params=params)
+            self.metrics.record(metrics_key, time.perf_counter() - started, len(response.content), throttled)
+            self.rate_limiter.update(response.headers)
+            if response.status_code != 429:
+                response.raise_for_status()
+                return response
+
+            retry_after = _retry_after(response)
+            logging.warning(f"Zendesk rate limit reached, waiting {retry_after} seconds")
+            self.rate_limiter.block(retry_after, url)
+
+        response.raise_for_status()
+        return response
+
+
+def _page_params(pagination: PaginationType, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Adds the page size of the pagination type to the query params
+    """
+    # update the page size to enable cursor pagination
+    params = params or {}
+    if pagination == PaginationType.CURSOR:
+        params["page[size]"] = PAGE_SIZE
+    elif pagination in (PaginationType.STREAM, PaginationType.STREAM_CURSOR):
+        params["per_page"] = INCREMENTAL_PAGE_SIZE
+    elif pagination == PaginationType.START_TIME:
+        params["limit"] = INCREMENTAL_PAGE_SIZE
+    return params
+
+
+def _next_url(response_json: Dict[str, Any], pagination: PaginationType) -> Optional[str]:
+    """
+    URL of the page following the response, None on the last page
+    """
+    if pagination == PaginationType.CURSOR:
+        if response_json["meta"]["has_more"]:
+            return response_json["links"]["next"]
+    elif pagination == PaginationType.OFFSET:
+        return response_json.get("next_page", None)
+    elif pagination == PaginationType.STREAM:
+        # See
+        # https://developer.zendesk.com/api-reference/ticketing/ticket-management/incremental_exports/#json-format
+        if not response_json["end_of_stream"]:
+            return response_json["next_page"]
+    elif pagination == PaginationType.START_TIME:
+        if response_json["count"] > 0:
+            return response_json["next_page"]
+    elif pagination == PaginationType.STREAM_CURSOR:
+        # See
+        # https://developer.zendesk.com/api-reference/ticketing/ticket-management/incremental_exports/#cursor-based-incremental-exports
+        if not response_json["end_of_stream"]:
+            return response_json["after_url"]
+    return None
+
+
+def _retry_after(response: Response) -> float:
+    try:
+        return float(response.headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+    except ValueError:
+        return DEFAULT_RETRY_AFTER
+
+
+def _prefetch(items: Iterator[T], depth: int) -> Iterator[T]:
+    """
+    Reads ahead up to `depth` items of the iterator in a background thread, so the next page is already
+    on its way while the consumer processes the current one. Exceptions are re-raised in the consumer.
+    """
+    if depth < 1:
+        yield from items
+        return
+    yield from merge_iterators([items], depth)
+
+
+def merge_iterators(iterators: List[Iterator[T]], depth: int = 1) -> Iterator[T]:
+    """
+    Reads the iterators at the same time, each one in its own background thread, and yields their items
+    in the order they arrive. Up to `depth` items of each iterator are read ahead. Exceptions are re-raised
+    in the consumer.
+    """
+    queue: Queue = Queue(maxsize=max(depth, 1) * max(len(iterators), 1))
+    stopped = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stopped.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce(items: Iterator[T]) -> None:
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((_END_OF_ITEMS, None))
+        except Exception as e:
+            put((_END_OF_ITEMS, e))
+
+    for items in iterators:
+        threading.Thread(target=produce, args=(items,), daemon=True).start()
+    try:
+        remaining = len(iterators)
+        while remaining:
+            item, error = queue.get()
+            if item is _END_OF_ITEMS:
+                if error:
+                    raise error
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        # stops the producers when the consumer finishes early
+        stopped.set()
@@ -0,0 +1,52 @@
+"""
+This module converts API pages to Arrow tables, so dlt loads them without the per row normalization
+"""
+from typing import Any, Dict, List, Optional, Type, get_args, get_origin
+
+from dlt.common import json
+from dlt.common.libs.pyarrow import pyarrow as pa
+from dlt.common.libs.pydantic import BaseModel
+from dlt.common.typing import TDataItem
+
+SCALAR_TYPES = {
+    int: pa.int64(),
+    str: pa.string(),
+    bool: pa.bool_(),
+    float: pa.float64(),
+}
+
+
+def arrow_schema(model: Type[BaseModel]) -> pa.Schema:
+    """
+    Arrow schema of a Zendesk object model. Nested objects and lists are kept as JSON strings,
+    the same values dlt stores in the complex columns.
+    """
+    return pa.schema([
+        pa.field(name, _scalar_type(field.annotation) or pa.string()) for name, field in model.model_fields.items()
+    ])
+
+
+def page_to_arrow(page: List[TDataItem], model: Type[BaseModel], schema: pa.Schema) -> pa.Table:
+    """
+    Builds an Arrow table of a page column by column. Like the pydantic validation it drops the fields
+    that are not in the model and fills the missing ones with the model defaults.
+    """
+    columns: Dict[str, List[Any]] = {}
+    for name, field in model.model_fields.items():
+        default = None if field.is_required() else field.get_default(call_default_factory=True)
+        values = [item.get(name, default) for item in page]
+        if _scalar_type(field.annotation) is None:
+            values = [None if value is None else json.dumps(value) for value in values]
+        columns[name] = values
+    return pa.Table.from_pydict(columns, schema=schema)
+
+
+def _scalar_type(annotation: Any) -> Optional[pa.DataType]:
+    """
+    Arrow type of a scalar model field, None for the nested objects and lists
+    """
+    # Optional[X] is Union[X, None]
+    args = [arg for arg in get_args(annotation) if arg is not type(None)]
+    if get_origin(annotation) is not None and len(args) == 1:
+        annotation = args[0]
+    return SCALAR_TYPES.get(annotation)
@@ -0,0 +1,77 @@
+"""
+This module collects the request statistics of the API client
+"""
+import math
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict
+
+LATENCY_PERCENTILES = (50, 90, 99)
+# the latencies are counted in buckets growing by 5 %, so the percentiles are exact to 5 % in a fixed memory
+LATENCY_BUCKET_GROWTH = 1.05
+MIN_LATENCY_BUCKET = 0.001
+
+
+class RequestMetrics:
+    """
+    Thread safe request statistics per endpoint, keyed by the data point name of the requested pages
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._requests: Dict[str, int] = defaultdict(int)
+        self._bytes: Dict[str, int] = defaultdict(int)
+        self._throttled: Dict[str, float] = defaultdict(float)
+        self._latencies: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, key: str, latency: float, size: int, throttled: float) -> None:
+        """
+        Records one request
+
+        Args:
+            key: Endpoint the request belongs to, e.g. tickets
+            latency: Seconds until the response was received
+            size: Bytes of the response body
+            throttled: Seconds the request waited for the rate limiter
+        """
+        with self._lock:
+            self._requests[key] += 1
+            self._bytes[key] += size
+            self._throttled[key] += throttled
+            self._latencies[key][_latency_bucket(latency)] += 1
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns:
+            Request count, downloaded bytes, latency percentiles in milliseconds and throttled seconds per endpoint
+        """
+        with self._lock:
+            summary = {}
+            for key, latencies in self._latencies.items():
+                summary[key] = {
+                    "requests": self._requests[key],
+                    "bytes": self._bytes[key],
+                    "throttled_seconds": round(self._throttled[key], 3),
+                    **{f"latency_p{p}_ms": round(_percentile(latencies, p) * 1000, 1) for p in LATENCY_PERCENTILES},
+                }
+            return summary
+
+
+def _latency_bucket(latency: float) -> int:
+    if latency <= MIN_LATENCY_BUCKET:
+        return 0
+    return math.ceil(math.log(latency / MIN_LATENCY_BUCKET, LATENCY_BUCKET_GROWTH))
+
+
+def _percentile(buckets: Counter, percentile: int) -> float:
+    """
+    Upper bound of the latency bucket holding the percentile
+    """
+    count = sum(buckets.values())
+    rank = min(count, max(1, round(percentile / 100 * count)))
+    seen = 0
+    for bucket in sorted(buckets):
+        seen += buckets[bucket]
+        if seen >= rank:
+            return MIN_LATENCY_BUCKET * LATENCY_BUCKET_GROWTH ** bucket
+    return 0.0
@@ -0,0 +1,143 @@
+"""
+This module holds the request scheduler shared by all resources of the Zendesk source
+"""
+import logging
+import threading
+import time
+from typing import Mapping, Optional
+from urllib.parse import urlparse
+
+# Zendesk Support plans start at 200 requests per minute, the real budget is learned from the response headers
+DEFAULT_REQUESTS_PER_MINUTE = 200
+# fraction of the account budget we allow ourselves to use, the rest is left for other API consumers
+SAFETY_FACTOR = 0.9
+# the incremental exports have their own budget on top of the account one, it is not announced in the headers, see
+# https://developer.zendesk.com/api-reference/ticketing/ticket-management/incremental_exports/#rate-limits
+EXPORT_REQUESTS_PER_MINUTE = 10
+EXPORT_PATH_PREFIX = "/api/v2/incremental/"
+
+RATE_LIMIT_HEADERS = ("X-Rate-Limit", "ratelimit-limit")
+RATE_LIMIT_REMAINING_HEADERS = ("X-Rate-Limit-Remaining", "ratelimit-remaining")
+RATE_LIMIT_RESET_HEADERS = ("ratelimit-reset",)
+
+
+class RateLimiter:
+    """
+    Thread safe token bucket which paces requests just below the account-wide Zendesk rate limit.
+
+    The bucket refills continuously at the learned rate. Every request takes one token and waits when the bucket
+    is empty. A request of an incremental export takes a token of the separate export bucket as well.
+    A 429 response blocks the callers of its bucket for exactly the `Retry-After` interval.
+    """
+
+    def __init__(self, requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+                 safety_factor: float = SAFETY_FACTOR,
+                 export_requests_per_minute: Optional[int] = EXPORT_REQUESTS_PER_MINUTE) -> None:
+        self._lock = threading.Lock()
+        self._safety_factor = safety_factor
+        self._limit = requests_per_minute
+        self._capacity = self._limit * self._safety_factor
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._exports = RateLimiter(export_requests_per_minute, safety_factor, export_requests_per_minute=None) \
+            if export_requests_per_minute else None
+
+    @property
+    def rate(self) -> float:
+        """Allowed requests per second"""
+        return self._capacity / 60
+
+    def acquire(self, url: str = "") -> float:
+        """
+        Blocks until a request may be sent.
+
+        Args:
+            url: URL of the request, the incremental exports wait for their own bucket first
+
+        Returns:
+            Number of seconds the caller was throttled
+        """
+        throttled = 0.0
+        if self._exports and _is_export(url):
+            throttled += self._exports.acquire()
+        reserved = False
+        while not reserved:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                else:
+                    # the token is reserved right away, an empty bucket goes into debt which the caller sleeps off
+                    reserved = True
+                    self._tokens -= 1
+                    wait = max(-self._tokens, 0) / self.rate
+            if wait:
+                time.sleep(wait)
+                throttled += wait
+        return throttled
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """
+        Learns the budget from the rate limit headers of a response.
+
+        Args:
+            headers: Case-insensitive response headers
+        """
+        limit = _header_value(headers, RATE_LIMIT_HEADERS)
+        remaining = _header_value(headers, RATE_LIMIT_REMAINING_HEADERS)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if limit and limit != self._limit:
+                logging.debug(f"Zendesk rate limit set to {limit} requests per minute")
+                self._limit = limit
+                self._capacity = limit * self._safety_factor
+            if remaining is not None:
+                # keep the same headroom the safety factor gives us on the whole budget
+                reserve = self._limit - self._capacity
+                self._tokens = min(self._tokens, max(remaining - reserve, 0))
+                if self._tokens < 1 and remaining <= reserve:
+                    reset = _header_value(headers, RATE_LIMIT_RESET_HEADERS)
+                    if reset:
+                        self._blocked_until = max(self._blocked_until, now + reset)
+
+    def block(self, seconds: float, url: str = "") -> None:
+        """
+        Stops the callers of the bucket for the given time, used for the `Retry-After` of a 429 response.
+        A rate limited incremental export stops only the other exports.
+
+        Args:
+            seconds: Number of seconds to wait before the next request
+            url: URL of the rate limited request
+        """
+        if self._exports and _is_export(url):
+            self._exports.block(seconds)
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + seconds)
+            # the bucket refills from the end of the block with the token of the first request after it
+            self._tokens = 1
+            self._updated_at = self._blocked_until
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated_at:
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+
+def _is_export(url: str) -> bool:
+    return urlparse(url).path.startswith(EXPORT_PATH_PREFIX)
+
+
+def _header_value(headers: Mapping[str, str], names: tuple) -> Optional[int]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return int(float(value))
+            except ValueError:
+                continue
+    return None
@@ -0,0 +1,39 @@
+"""
+This module collects the records sideloaded by the responses of an incremental export
+"""
+import threading
+from typing import Any, Dict, Iterator, List, Sequence, Set, Tuple
+
+from dlt.common.typing import TDataItem
+
+
+class Sideloads:
+    """
+    Thread safe collector of the records sideloaded by the responses of an export, e.g. the users, groups and
+    organizations of the tickets. Every record is kept once per run by its id, a sideloaded record is the current
+    version of the entity, so its later copies are the same.
+    """
+
+    def __init__(self, names: Sequence[str]) -> None:
+        self._lock = threading.Lock()
+        self._seen: Dict[str, Set[Any]] = {name: set() for name in names}
+        self._pending: Dict[str, List[TDataItem]] = {name: [] for name in names}
+
+    def collect(self, response: Dict[str, Any]) -> None:
+        with self._lock:
+            for name, seen in self._seen.items():
+                for item in response.get(name) or []:
+                    if item["id"] not in seen:
+                        seen.add(item["id"])
+                        self._pending[name].append(item)
+
+    def pop(self) -> Iterator[Tuple[str, List[TDataItem]]]:
+        """
+        Returns:
+            Records collected since the last call as (name, records) tuples, names without new records are skipped
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {name: [] for name in self._pending}
+        for name, items in pending.items():
+            if items:
+                yield name, items
@@ -0,0 +1,65 @@
+"""
+This module holds the index of the ticket details fetched by the previous runs
+"""
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from dlt.common.typing import TDataItem
+
+# ticket id -> (comment count when the comments were fetched, updated_at when the audits were fetched,
+# start of the run which fetched them)
+TIndexEntry = Tuple[Optional[int], Optional[str], Optional[int]]
+TIndexRow = Tuple[int, Optional[int], Optional[str], Optional[int]]
+
+
+class TicketIndex:
+    """
+    Thread safe index of the comment count and update time of each ticket at the time its details were fetched.
+    A ticket without comments or with the same comment count has no new comments and an unchanged update time
+    means no new audits, so the per ticket requests can be skipped.
+    Every entry keeps the start of the run which fetched the details, the entries of the runs whose results were
+    not committed must not be loaded.
+    """
+
+    def __init__(self, entries: Optional[Iterable[TIndexRow]] = None, run_start: Optional[int] = None) -> None:
+        """
+        Args:
+            entries: Rows of the index as returned by `rows`
+            run_start: Start of the run which owns the index, the entries of the fetched tickets get it
+        """
+        self._lock = threading.Lock()
+        self._run_start = run_start
+        self._entries: Dict[int, TIndexEntry] = {
+            ticket_id: (comment_count, updated_at, fetched_by) for ticket_id, comment_count, updated_at, fetched_by
+            in entries or []
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def has_new_comments(self, ticket: TDataItem) -> bool:
+        comment_count = ticket.get("comment_count")
+        if comment_count == 0:
+            return False
+        fetched_count, _, _ = self._entries.get(ticket["id"], (None, None, None))
+        return comment_count is None or fetched_count != comment_count
+
+    def has_new_audits(self, ticket: TDataItem) -> bool:
+        _, fetched_updated_at, _ = self._entries.get(ticket["id"], (None, None, None))
+        return ticket.get("updated_at") is None or fetched_updated_at != ticket["updated_at"]
+
+    def comments_fetched(self, ticket: TDataItem) -> None:
+        with self._lock:
+            _, updated_at, _ = self._entries.get(ticket["id"], (None, None, None))
+            self._entries[ticket["id"]] = (ticket.get("comment_count"), updated_at, self._run_start)
+
+    def audits_fetched(self, ticket: TDataItem) -> None:
+        with self._lock:
+            comment_count, _, _ = self._entries.get(ticket["id"], (None, None, None))
+            self._entries[ticket["id"]] = (comment_count, ticket.get("updated_at"), self._run_start)
+
+    def rows(self) -> Iterator[TIndexRow]:
+        with self._lock:
+            entries = list(self._entries.items())
+        for ticket_id, (comment_count, updated_at, fetched_by) in entries:
+            yield ticket_id, comment_count, updated_at, fetched_by
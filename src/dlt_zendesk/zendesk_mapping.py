@@ -57,19 +57,27 @@ views = {
 
     TableMapping("users_photos", """
         CREATE VIEW users_photos AS
+        WITH photos AS (
+            SELECT
+                id,
+                json_transform(photo, '{"id": "JSON", "file_name": "VARCHAR", "content_url": "VARCHAR",
+                                        "content_type": "VARCHAR", "size": "JSON", "width": "JSON",
+                                        "height": "JSON", "inline": "JSON"}') AS p
+            FROM
+                users_raw
+            WHERE json(photo) IS NOT NULL)
         SELECT
             id AS users_pk,
-            json(photo).id AS id,
-            json_extract_string(photo,'$.file_name') AS file_name,
-            json_extract_string(photo,'$.content_url') AS content_url,
-            json_extract_string(photo,'$.content_type') AS content_type,
-            json(photo).size AS size,
-            json(photo).width AS width,
-            json(photo).height AS height,
-            json(photo).inline AS inline
+            p.id AS id,
+            p.file_name AS file_name,
+            p.content_url AS content_url,
+            p.content_type AS content_type,
+            p.size AS size,
+            p.width AS width,
+            p.height AS height,
+            p.inline AS inline
         FROM
-            users_raw
-        WHERE json(photo) IS NOT NULL;
+            photos;
     """, ["users_raw"], ["id"]),
 
     TableMapping("users_groups", """
@@ -160,10 +168,10 @@ views = {
         CREATE VIEW tickets_fields_values AS
         SELECT
             id AS tickets_pk,
-            json_extract_string(cf.value,'$') AS value,
+            cf.value AS value,
             cf.id AS tickets_fields_pk
         FROM (
-        SELECT id, json(unnest(custom_fields->>'$[*]'))  cf
+        SELECT id, json_transform(unnest(custom_fields->>'$[*]'), '{"id": "JSON", "value": "VARCHAR"}') cf
         FROM
             tickets_raw tr)
         WHERE cf.id IS NOT NULL ;
@@ -171,49 +179,83 @@ views = {
 
     TableMapping("tickets_ratings", """
         CREATE VIEW tickets_ratings AS
+        WITH ratings AS (
+            SELECT
+                id,
+                json_transform(satisfaction_rating, '{"score": "JSON", "id": "JSON"}') AS sr
+            FROM
+                tickets_raw
+            WHERE json(satisfaction_rating) IS NOT NULL)
         SELECT
             id AS tickets_pk,
-            json(satisfaction_rating).score AS score,
-            json(satisfaction_rating).id AS id,
+            sr.score AS score,
+            sr.id AS id,
         FROM
-            tickets_raw
-        WHERE json(satisfaction_rating) IS NOT NULL;
+            ratings;
     """, ["tickets_raw"], ["tickets_pk"]),
 
     TableMapping("tickets_metrics", """
         CREATE VIEW tickets_metrics AS
+        WITH metrics AS (
+            SELECT
+                id,
+                json_transform(metric_set, '{
+                    "id": "JSON",
+                    "ticket_id": "JSON",
+                    "created_at": "VARCHAR",
+                    "updated_at": "VARCHAR",
+                    "group_stations": "JSON",
+                    "assignee_stations": "JSON",
+                    "reopens": "JSON",
+                    "replies": "JSON",
+                    "assignee_updated_at": "VARCHAR",
+                    "requester_updated_at": "VARCHAR",
+                    "status_updated_at": "VARCHAR",
+                    "initially_assigned_at": "VARCHAR",
+                    "assigned_at": "VARCHAR",
+                    "solved_at": "VARCHAR",
+                    "latest_comment_added_at": "VARCHAR",
+                    "reply_time_in_minutes_calendar": "JSON",
+                    "reply_time_in_minutes_business": "JSON",
+                    "first_resolution_time_in_minutes": {"calendar": "JSON", "business": "JSON"},
+                    "full_resolution_time_in_minutes": {"calendar": "JSON", "business": "JSON"},
+                    "agent_wait_time_in_minutes": {"calendar": "JSON", "business": "JSON"},
+                    "requester_wait_time_in_minutes": {"calendar": "JSON", "business": "JSON"},
+                    "on_hold_time_in_minutes": {"calendar": "JSON", "business": "JSON"}}') AS ms
+            FROM
+                tickets_raw
+            WHERE json(metric_set) IS NOT NULL)
         SELECT
             id AS tickets_pk,
-            json(metric_set).id AS id,
-            json(metric_set).ticket_id AS ticket_id,
-            json_extract_string(metric_set,'$.created_at') AS created_at,
-            json_extract_string(metric_set,'$.updated_at') AS updated_at,
-            json(metric_set).group_stations AS group_stations,
-            json(metric_set).assignee_stations AS assignee_stations,
-            json(metric_set).reopens AS reopens,
-            json(metric_set).replies AS replies,
-            json_extract_string(metric_set,'$.assignee_updated_at') AS assignee_updated_at,
-            json_extract_string(metric_set,'$.requester_updated_at') AS requester_updated_at,
-            json_extract_string(metric_set,'$.status_updated_at') AS status_updated_at,
-            json_extract_string(metric_set,'$.initially_assigned_at') AS initially_assigned_at,
-            json_extract_string(metric_set,'$.assigned_at') AS assigned_at,
-            json_extract_string(metric_set,'$.solved_at') AS solved_at,
-            json_extract_string(metric_set,'$.latest_comment_added_at') AS latest_comment_added_at,
-            json(metric_set).reply_time_in_minutes_calendar AS reply_time_in_minutes_calendar,
-            json(metric_set).reply_time_in_minutes_business AS reply_time_in_minutes_business,
-            json(metric_set).first_resolution_time_in_minutes.calendar AS first_resolution_time_in_minutes_calendar,
-            json(metric_set).first_resolution_time_in_minutes.business AS first_resolution_time_in_minutes_business,
-            json(metric_set).full_resolution_time_in_minutes.calendar AS full_resolution_time_in_minutes_calendar,
-            json(metric_set).full_resolution_time_in_minutes.business AS full_resolution_time_in_minutes_business,
-            json(metric_set).agent_wait_time_in_minutes.calendar AS agent_wait_time_in_minutes_calendar,
-            json(metric_set).agent_wait_time_in_minutes.business AS agent_wait_time_in_minutes_business,
-            json(metric_set).requester_wait_time_in_minutes.calendar AS requester_wait_time_in_minutes_calendar,
-            json(metric_set).requester_wait_time_in_minutes.business AS requester_wait_time_in_minutes_business,
-            json(metric_set).on_hold_time_in_minutes.calendar AS on_hold_time_in_minutes_calendar,
-            json(metric_set).on_hold_time_in_minutes.business AS on_hold_time_in_minutes_business
+            ms.id AS id,
+            ms.ticket_id AS ticket_id,
+            ms.created_at AS created_at,
+            ms.updated_at AS updated_at,
+            ms.group_stations AS group_stations,
+            ms.assignee_stations AS assignee_stations,
+            ms.reopens AS reopens,
+            ms.replies AS replies,
+            ms.assignee_updated_at AS assignee_updated_at,
+            ms.requester_updated_at AS requester_updated_at,
+            ms.status_updated_at AS status_updated_at,
+            ms.initially_assigned_at AS initially_assigned_at,
+            ms.assigned_at AS assigned_at,
+            ms.solved_at AS solved_at,
+            ms.latest_comment_added_at AS latest_comment_added_at,
+            ms.reply_time_in_minutes_calendar AS reply_time_in_minutes_calendar,
+            ms.reply_time_in_minutes_business AS reply_time_in_minutes_business,
+            ms.first_resolution_time_in_minutes.calendar AS first_resolution_time_in_minutes_calendar,
+            ms.first_resolution_time_in_minutes.business AS first_resolution_time_in_minutes_business,
+            ms.full_resolution_time_in_minutes.calendar AS full_resolution_time_in_minutes_calendar,
+            ms.full_resolution_time_in_minutes.business AS full_resolution_time_in_minutes_business,
+            ms.agent_wait_time_in_minutes.calendar AS agent_wait_time_in_minutes_calendar,
+            ms.agent_wait_time_in_minutes.business AS agent_wait_time_in_minutes_business,
+            ms.requester_wait_time_in_minutes.calendar AS requester_wait_time_in_minutes_calendar,
+            ms.requester_wait_time_in_minutes.business AS requester_wait_time_in_minutes_business,
+            ms.on_hold_time_in_minutes.calendar AS on_hold_time_in_minutes_calendar,
+            ms.on_hold_time_in_minutes.business AS on_hold_time_in_minutes_business
         FROM
-            tickets_raw
-        WHERE json(metric_set) IS NOT NULL;
+            metrics;
     """, ["tickets_raw"], ["ticket_id", "id"]),
 
     TableMapping("tickets_fields", """
@@ -249,17 +291,19 @@ views = {
         CREATE VIEW tickets_comments_attachments AS
         SELECT
             id AS tickets_comments_pk,
-            json_extract(att,'$.id') AS id,
-            json_extract_string(att,'$.file_name') AS file_name,
-            json_extract_string(att,'$.content_url') AS content_url,
-            json_extract_string(att,'$.content_type') AS content_type,
-            json_extract(att,'$.size') AS size,
-            json_extract(att,'$.width') AS width,
-            json_extract(att,'$.height') AS height,
-            json_extract(att,'$.inline') AS inline
+            att.id AS id,
+            att.file_name AS file_name,
+            att.content_url AS content_url,
+            att.content_type AS content_type,
+            att.size AS size,
+            att.width AS width,
+            att.height AS height,
+            att.inline AS inline
         FROM (
             SELECT id,
-                   json(unnest(attachments->>'$[*]')) as att
+                   json_transform(unnest(attachments->>'$[*]'), '{
+                        "id": "JSON", "file_name": "VARCHAR", "content_url": "VARCHAR", "content_type": "VARCHAR",
+                        "size": "JSON", "width": "JSON", "height": "JSON", "inline": "JSON"}') as att
             FROM ticket_comments_raw)
         WHERE att.id IS NOT NULL;
     """, ["ticket_comments_raw"], ["id"]),
@@ -268,17 +312,19 @@ views = {
         CREATE VIEW tickets_comments_attachments_thumbnails AS
         SELECT
             id AS tickets_comments_attachments_pk,
-            json_extract(th,'$.id') AS id,
-            json_extract_string(th,'$.file_name') AS file_name,
-            json_extract_string(th,'$.content_url') AS content_url,
-            json_extract_string(th,'$.content_type') AS content_type,
-            json_extract(th,'$.size') AS size,
-            json_extract(th,'$.width') AS width,
-            json_extract(th,'$.height') AS height,
-            json_extract(th,'$.inline') AS inline
+            th.id AS id,
+            th.file_name AS file_name,
+            th.content_url AS content_url,
+            th.content_type AS content_type,
+            th.size AS size,
+            th.width AS width,
+            th.height AS height,
+            th.inline AS inline
         FROM
             (SELECT id,
-                   json(unnest(json(att).thumbnails->>'$[*]')) as th
+                   json_transform(unnest(json(att).thumbnails->>'$[*]'), '{
+                        "id": "JSON", "file_name": "VARCHAR", "content_url": "VARCHAR", "content_type": "VARCHAR",
+                        "size": "JSON", "width": "JSON", "height": "JSON", "inline": "JSON"}') as th
             FROM
                (SELECT id,
                        json(unnest(attachments->>'$[*]')) as att
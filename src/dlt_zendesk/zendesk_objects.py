@@ -117,6 +117,7 @@ class Tickets(BaseModel):
     updated_at: Optional[str] = Field(default=None)
     tags: Optional[list] = Field(default=[])
     metric_set: Optional[object] = Field(default={})
+    comment_count: Optional[int] = Field(default=None)
 
 
 class TicketAudits(BaseModel):
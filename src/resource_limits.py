@@ -0,0 +1,52 @@
+import os
+from typing import Optional
+
+import psutil
+
+# cgroup v2 files first, cgroup v1 files as a fallback
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_CPU_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CPU_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+CGROUP_MEMORY_MAX = "/sys/fs/cgroup/memory.max"
+CGROUP_V1_MEMORY_LIMIT = "/sys/fs/cgroup/memory/memory.limit_in_bytes"
+# cgroup v1 reports a page aligned max int64 when there is no memory limit
+CGROUP_V1_UNLIMITED = 1 << 60
+
+
+def cpu_limit() -> int:
+    """
+    Number of CPUs the container may use, taken from the cgroup quota or the CPUs of the machine.
+    """
+    cpu_max = _read(CGROUP_CPU_MAX)
+    if cpu_max:
+        quota, period = (cpu_max.split() + ["100000"])[:2]
+    else:
+        quota, period = _read(CGROUP_V1_CPU_QUOTA), _read(CGROUP_V1_CPU_PERIOD)
+
+    cpus = os.cpu_count() or 1
+    try:
+        if quota and period and quota not in ("max", "-1"):
+            cpus = min(cpus, int(quota) / int(period))
+    except ValueError:
+        pass
+    return max(1, int(cpus))
+
+
+def memory_limit() -> int:
+    """
+    Memory in bytes the container may use, taken from the cgroup limit or the memory of the machine.
+    """
+    memory = psutil.virtual_memory().total
+    for path in (CGROUP_MEMORY_MAX, CGROUP_V1_MEMORY_LIMIT):
+        limit = _read(path)
+        if limit and limit.isdigit() and int(limit) < CGROUP_V1_UNLIMITED:
+            return min(memory, int(limit))
+    return memory
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
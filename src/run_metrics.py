@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from dlt.pipeline.trace import PipelineTrace
+
+from dlt_zendesk.helpers.metrics import RequestMetrics
+
+RUN_METRICS_COLUMNS = ["run_start", "section", "name", "metric", "value"]
+
+
+class RunMetrics:
+    """
+    Collects the metrics of a run: duration of the stages, request statistics of the API endpoints,
+    rows of the raw tables and duration and size of the exported views.
+    """
+
+    def __init__(self, run_start: int):
+        self.run_start = run_start
+        self.requests = RequestMetrics()
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.tables: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        self.views: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = {"seconds": round(time.perf_counter() - started, 3)}
+
+    def add_pipeline_trace(self, trace: PipelineTrace) -> None:
+        """
+        Takes the extract, normalize and load durations and the row counts of the raw tables from the dlt trace,
+        the traces of several pipeline runs are summed up
+        """
+        for step in trace.steps:
+            if step.step != "run" and step.finished_at:
+                seconds = self.stages.get(step.step, {}).get("seconds", 0) + \
+                    (step.finished_at - step.started_at).total_seconds()
+                self.stages[step.step] = {"seconds": round(seconds, 3)}
+
+        for load_metrics in (trace.last_extract_info.metrics if trace.last_extract_info else {}).values():
+            for job_metrics in load_metrics:
+                for table, table_metrics in job_metrics["table_metrics"].items():
+                    rows = self.tables[table].get("rows_extracted", 0) + table_metrics.items_count
+                    self.tables[table]["rows_extracted"] = rows
+        if trace.last_normalize_info:
+            for table, rows in trace.last_normalize_info.row_counts.items():
+                self.tables[table]["rows_normalized"] = self.tables[table].get("rows_normalized", 0) + rows
+
+    def add_view(self, name: str, seconds: float, size: int) -> None:
+        with self._lock:
+            self.views[name] = {"seconds": round(seconds, 3), "bytes": size}
+
+    def report(self) -> Dict[str, Any]:
+        tables = {table: metrics for table, metrics in self.tables.items() if not table.startswith("_dlt")}
+        return {
+            "run_start": self.run_start,
+            "stages": self.stages,
+            "requests": self.requests.summary(),
+            "tables": tables,
+            "views": self.views,
+        }
+
+    def rows(self) -> List[List[Any]]:
+        """
+        The report flattened to the rows of the run_metrics table, see RUN_METRICS_COLUMNS
+        """
+        report = self.report()
+        return [[self.run_start, section, name, metric, value]
+                for section in ("stages", "requests", "tables", "views")
+                for name, metrics in report[section].items()
+                for metric, value in metrics.items()]
+
+    def write_json(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def log_summary(self) -> None:
+        stages = ", ".join(f"{name} {metrics['seconds']} s" for name, metrics in self.stages.items())
+        logging.info(f"Run stages: {stages}")
+        for key, metrics in self.requests.summary().items():
+            logging.info(f"Requests of {key}: {metrics}")
@@ -0,0 +1,190 @@
+"""
+End-to-end throughput benchmark of the component against the local Zendesk mock server.
+
+Runs `Component.run` on synthetic data and reports the duration, rows/s, requests/s and peak RSS
+(including the normalize worker processes) of the extract, normalize, load, view and export stages:
+
+    python tests/benchmarks/bench_component.py --tickets 20000 --comments 3 --latency 0.05 \
+        --parameters '{"performance": {"arrow_extraction": true}}'
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+import psutil
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from tests.zendesk_mock_server import ZendeskMockServer  # noqa: E402
+
+import duckdb  # noqa: E402
+from dlt.pipeline.pipeline import Pipeline  # noqa: E402
+
+from component import Component  # noqa: E402
+
+PARAMETERS = {
+    "authentication": {"email": "user@mock.com", "#api_token": "token", "sub_domain": "mock"},
+    "sync_options": {"sync_mode": "full_sync"},
+    "destination": {"load_type": "full_load"},
+    "available_details": {"ticket_comments_raw": True, "ticket_audits_raw": True},
+}
+SAMPLE_INTERVAL = 0.05
+
+
+class StageMonitor:
+    """
+    Measures the duration and the peak memory of the process and its children per stage
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, Dict[str, Any]] = OrderedDict()
+        self._process = psutil.Process()
+        self._peak_rss = 0
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def start(self) -> None:
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._sampler.join()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict[str, Any]]:
+        stats = self.stages.setdefault(name, {"seconds": 0.0, "rows": 0, "requests": 0, "peak_rss_mb": 0})
+        self._peak_rss = self._rss()
+        started = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats["seconds"] += time.perf_counter() - started
+            stats["peak_rss_mb"] = max(stats["peak_rss_mb"], max(self._peak_rss, self._rss()) // (1024 * 1024))
+
+    def wrap(self, owner: type, method: str, name: str) -> None:
+        original = getattr(owner, method)
+        monitor = self
+
+        def timed(instance: Any, *args: Any, **kwargs: Any) -> Any:
+            with monitor.stage(name) as stats:
+                result = original(instance, *args, **kwargs)
+                stats["result"] = result
+                return result
+
+        setattr(owner, method, timed)
+
+    def _rss(self) -> int:
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(SAMPLE_INTERVAL):
+            self._peak_rss = max(self._peak_rss, self._rss())
+
+
+def count_output_rows(data_dir: str) -> int:
+    rows = 0
+    for path in glob.glob(os.path.join(data_dir, "out", "tables", "**", "*.csv*"), recursive=True):
+        if path.endswith(".manifest"):
+            continue
+        opener = gzip.open if path.endswith(".gz") else open
+        # the tables are written without the header, the columns are in the manifest
+        with opener(path, "rt") as f:
+            rows += sum(1 for _ in f)
+    for path in glob.glob(os.path.join(data_dir, "out", "files", "*.parquet")):
+        rows += duckdb.sql(f"SELECT count(*) FROM read_parquet('{path}')").fetchone()[0]
+    return rows
+
+
+def run(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    parameters = json.loads(json.dumps(PARAMETERS))
+    for key, value in json.loads(args.parameters).items():
+        if isinstance(value, dict):
+            parameters.setdefault(key, {}).update(value)
+        else:
+            parameters[key] = value
+
+    data_dir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(data_dir, "out", "tables"))
+    os.makedirs(os.path.join(data_dir, "out", "files"))
+    with open(os.path.join(data_dir, "config.json"), "w") as config_file:
+        json.dump({"parameters": parameters, "storage": {}, "action": "run"}, config_file)
+
+    monitor = StageMonitor()
+    monitor.wrap(Pipeline, "extract", "extract")
+    monitor.wrap(Pipeline, "normalize", "normalize")
+    monitor.wrap(Pipeline, "load", "load")
+    monitor.wrap(Component, "_prepare_views", "views")
+    monitor.wrap(Component, "_export_views", "export")
+
+    server = ZendeskMockServer(tickets=args.tickets, users=args.users, organizations=args.organizations,
+                               comments_per_ticket=args.comments, audits_per_ticket=args.audits,
+                               rate_limit=args.rate_limit or None, latency=args.latency)
+    os.environ["KBC_DATADIR"] = data_dir
+    os.environ["SOURCES__URL_PREFIX"] = server.url
+    try:
+        with server:
+            monitor.start()
+            with monitor.stage("total"):
+                Component().run()
+            monitor.stop()
+        stages = monitor.stages
+        stages["extract"]["rows"] = sum(server.items.values())
+        stages["extract"]["requests"] = sum(server.requests.values()) + server.rate_limited
+        normalized_rows = sum(stages["normalize"].pop("result").row_counts.values())
+        stages["normalize"]["rows"] = stages["load"]["rows"] = normalized_rows
+        stages["export"]["rows"] = count_output_rows(data_dir)
+        stages["total"]["rows"] = stages["extract"]["rows"]
+        stages["total"]["requests"] = stages["extract"]["requests"]
+        print(f"Mock server: {server.bytes_sent / (1024 * 1024):.1f} MB sent, {server.rate_limited} rate limited")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    for stats in stages.values():
+        stats.pop("result", None)
+        stats["rows_per_second"] = round(stats["rows"] / stats["seconds"]) if stats["seconds"] else 0
+        stats["requests_per_second"] = round(stats["requests"] / stats["seconds"], 1) if stats["seconds"] else 0
+        stats["seconds"] = round(stats["seconds"], 2)
+    return stages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--organizations", type=int, default=100)
+    parser.add_argument("--comments", type=int, default=2, help="comments per ticket")
+    parser.add_argument("--audits", type=int, default=2, help="audits per ticket")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per minute, 0 for unlimited")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each response")
+    parser.add_argument("--parameters", default="{}", help="JSON merged into the component parameters")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    stages = run(args)
+    print(f"{'stage':<10}{'seconds':>10}{'rows':>12}{'rows/s':>12}{'requests':>10}{'req/s':>10}{'peak MB':>10}")
+    for name, stats in stages.items():
+        print(f"{name:<10}{stats['seconds']:>10}{stats['rows']:>12}{stats['rows_per_second']:>12}"
+              f"{stats['requests']:>10}{stats['requests_per_second']:>10}{stats['peak_rss_mb']:>10}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(stages, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
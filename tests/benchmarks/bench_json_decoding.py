@@ -0,0 +1,93 @@
+"""
+Microbenchmark of the API response decoding.
+
+Compares the standard library decoder used by `response.json()` with the decoder of the API client on pages
+in the shape of the Zendesk responses: an incremental tickets page with metric sets and a page of ticket comments
+with the full `html_body`. Recorded responses can be passed as arguments instead of the generated pages:
+
+    python tests/benchmarks/bench_json_decoding.py [recorded_response.json ...]
+"""
+import json as std_json
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "src"))
+
+from dlt.common import json  # noqa: E402
+
+REPEAT = 5
+NUMBER = 20
+
+
+def tickets_page(count: int = 1000) -> dict:
+    tickets = [{
+        "id": i,
+        "url": f"https://example.zendesk.com/api/v2/tickets/{i}.json",
+        "subject": f"Ticket {i} subject with some words",
+        "description": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 10,
+        "status": "open",
+        "priority": "normal",
+        "requester_id": 1000 + i,
+        "assignee_id": 2000 + i,
+        "via": {"channel": "email", "source": {"from": {"address": f"user{i}@example.com"}, "to": {}, "rel": None}},
+        "custom_fields": [{"id": 360000000 + f, "value": None if f % 3 else f"value {f}"} for f in range(20)],
+        "tags": ["billing", "vip", f"tag_{i % 50}"],
+        "created_at": "2024-01-01T10:00:00Z",
+        "updated_at": "2024-02-01T10:00:00Z",
+        "comment_count": i % 12,
+        "metric_set": {
+            "id": i, "ticket_id": i, "reopens": 1, "replies": 3,
+            "reply_time_in_minutes": {"calendar": 60, "business": 30},
+            "first_resolution_time_in_minutes": {"calendar": 600, "business": 300},
+            "full_resolution_time_in_minutes": {"calendar": 900, "business": 450},
+            "agent_wait_time_in_minutes": {"calendar": 10, "business": 5},
+            "requester_wait_time_in_minutes": {"calendar": 20, "business": 10},
+            "created_at": "2024-01-01T10:00:00Z", "updated_at": "2024-02-01T10:00:00Z",
+        },
+    } for i in range(count)]
+    return {"tickets": tickets, "after_cursor": "MTcwNjc4MjQwMC4wfHwxMjM0NQ==", "end_of_stream": False}
+
+
+def comments_page(count: int = 100) -> dict:
+    comments = [{
+        "id": i,
+        "type": "Comment",
+        "author_id": 1000 + i,
+        "body": "Hello,\n\nthank you for contacting us. " * 20,
+        "html_body": "<div class=\"zd-comment\"><p>Hello,</p><p>thank you for contacting us.</p></div>" * 40,
+        "plain_body": "Hello, thank you for contacting us. " * 20,
+        "public": True,
+        "attachments": [{"id": i, "file_name": "screenshot.png", "content_type": "image/png", "size": 12345,
+                         "thumbnails": []}],
+        "via": {"channel": "web", "source": {"from": {}, "to": {}, "rel": None}},
+        "created_at": "2024-01-01T10:00:00Z",
+    } for i in range(count)]
+    return {"comments": comments, "meta": {"has_more": False}, "links": {"next": None}}
+
+
+def benchmark(name: str, content: bytes) -> None:
+    def std_decode():
+        std_json.loads(content.decode("utf-8"))
+
+    def client_decode():
+        json.loadb(content)
+
+    std_time = min(timeit.repeat(std_decode, repeat=REPEAT, number=NUMBER)) / NUMBER
+    client_time = min(timeit.repeat(client_decode, repeat=REPEAT, number=NUMBER)) / NUMBER
+    print(f"{name}: {len(content) / 1024:.0f} KB, json {std_time * 1000:.2f} ms, "
+          f"client {client_time * 1000:.2f} ms, {std_time / client_time:.1f}x faster")
+
+
+def main(paths: list) -> None:
+    if paths:
+        payloads = [(os.path.basename(path), open(path, "rb").read()) for path in paths]
+    else:
+        payloads = [("tickets page", std_json.dumps(tickets_page()).encode("utf-8")),
+                    ("comments page", std_json.dumps(comments_page()).encode("utf-8"))]
+    for name, content in payloads:
+        benchmark(name, content)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
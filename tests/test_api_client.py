@@ -0,0 +1,104 @@
+import json
+import unittest
+
+import mock
+
+from dlt_zendesk.helpers.api_client import ZendeskAPIClient, PaginationType
+from dlt_zendesk.helpers.credentials import ZendeskCredentialsToken
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200, headers=None):
+        self.payload = payload
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    @property
+    def content(self):
+        return json.dumps(self.payload).encode("utf-8")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+
+def cursor_page(items, next_url=None):
+    return FakeResponse({"items": items, "meta": {"has_more": next_url is not None}, "links": {"next": next_url}})
+
+
+class TestZendeskAPIClient(unittest.TestCase):
+
+    def setUp(self):
+        credentials = ZendeskCredentialsToken()
+        credentials.subdomain = "test"
+        credentials.email = "user@test.com"
+        credentials.token = "token"
+        self.credentials = credentials
+
+    def _client(self, responses, **kwargs):
+        client = ZendeskAPIClient(self.credentials, **kwargs)
+        client.client = mock.Mock()
+        client.client.get.side_effect = responses
+        client.rate_limiter = mock.Mock()
+        client.rate_limiter.acquire.return_value = 0.0
+        return client
+
+    def test_cursor_pages(self):
+        for prefetch_pages in (0, 1, 3):
+            client = self._client([cursor_page([1, 2], "next"), cursor_page([3])], prefetch_pages=prefetch_pages)
+            pages = list(client.get_pages("/api/v2/items.json", "items", PaginationType.CURSOR, read_ahead=True))
+            self.assertEqual(pages, [[1, 2], [3]])
+            self.assertEqual(client.client.get.call_args_list[1].kwargs["url"], "next")
+
+    def test_read_ahead_stops_at_max_pages(self):
+        client = self._client([cursor_page([1], "next"), cursor_page([2], "next"), cursor_page([3])])
+        pages = list(client.get_pages("/api/v2/items.json", "items", PaginationType.CURSOR, max_pages=2,
+                                      read_ahead=True))
+        self.assertEqual(pages, [[1], [2]])
+        self.assertEqual(client.client.get.call_count, 2)
+
+    def test_no_read_ahead_by_default(self):
+        client = self._client([cursor_page([1], "next"), cursor_page([2])], prefetch_pages=3)
+        with mock.patch("dlt_zendesk.helpers.api_client.threading.Thread") as thread:
+            pages = client.get_pages("/api/v2/items.json", "items", PaginationType.CURSOR)
+            self.assertEqual(next(pages), [1])
+            pages.close()
+        thread.assert_not_called()
+        self.assertEqual(client.client.get.call_count, 1)
+
+    def test_retry_after_on_rate_limit(self):
+        client = self._client([FakeResponse({}, 429, {"Retry-After": "7"}), cursor_page([1])])
+        pages = list(client.get_pages("/api/v2/items.json", "items", PaginationType.CURSOR))
+        self.assertEqual(pages, [[1]])
+        client.rate_limiter.block.assert_called_once_with(7.0, "https://test.zendesk.com/api/v2/items.json")
+        # the rate limited attempt is counted as well
+        self.assertEqual(client.metrics.summary()["items"]["requests"], 2)
+
+    def test_error_is_raised_in_consumer(self):
+        client = self._client([cursor_page([1], "next"), FakeResponse({}, 404)])
+        pages = client.get_pages("/api/v2/items.json", "items", PaginationType.CURSOR)
+        self.assertEqual(next(pages), [1])
+        with self.assertRaises(Exception):
+            next(pages)
+
+    def test_unchanged_pages_are_skipped(self):
+        client = self._client([FakeResponse({"items": [1], "meta": {"has_more": False}}, headers={"ETag": "v1"}),
+                               FakeResponse(None, 304),
+                               cursor_page([1], "next"), cursor_page([2]),
+                               cursor_page([1], "next"), cursor_page([2])])
+        cache = {}
+        self.assertEqual(client.get_pages_if_changed("/api/v2/items.json", "items", PaginationType.CURSOR, cache),
+                         [[1]])
+        self.assertEqual(cache["etag"], "v1")
+        # a single page is requested with its ETag
+        self.assertIsNone(client.get_pages_if_changed("/api/v2/items.json", "items", PaginationType.CURSOR, cache))
+        self.assertEqual(client.client.get.call_args_list[1].kwargs["headers"], {"If-None-Match": "v1"})
+        # more pages are compared by their content
+        self.assertEqual(client.get_pages_if_changed("/api/v2/items.json", "items", PaginationType.CURSOR, cache),
+                         [[1], [2]])
+        self.assertIsNone(cache["etag"])
+        self.assertIsNone(client.get_pages_if_changed("/api/v2/items.json", "items", PaginationType.CURSOR, cache))
+
+
+if __name__ == "__main__":
+    unittest.main()
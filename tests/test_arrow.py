@@ -0,0 +1,33 @@
+import importlib.util
+import unittest
+
+from dlt_zendesk.zendesk_objects import Organizations, Tickets
+
+
+@unittest.skipIf(importlib.util.find_spec("pyarrow") is None, "pyarrow is not installed")
+class TestArrow(unittest.TestCase):
+
+    def test_page_matches_model(self):
+        from dlt_zendesk.helpers.arrow import arrow_schema, page_to_arrow
+
+        page = [{"id": 1, "subject": "s", "via": {"channel": "web"}, "tags": ["a"], "comment_count": 3}]
+        table = page_to_arrow(page, Tickets, arrow_schema(Tickets))
+
+        self.assertEqual(table.column_names, list(Tickets.model_fields))
+        row = table.to_pylist()[0]
+        self.assertEqual(row["id"], 1)
+        self.assertEqual(row["via"], '{"channel":"web"}')
+        self.assertEqual(row["tags"], '["a"]')
+        # model defaults are used for the missing fields
+        self.assertEqual(row["custom_fields"], "[]")
+        self.assertIsNone(row["status"])
+
+    def test_required_fields_without_value(self):
+        from dlt_zendesk.helpers.arrow import arrow_schema, page_to_arrow
+
+        table = page_to_arrow([{"id": 3}], Organizations, arrow_schema(Organizations))
+        self.assertIsNone(table.to_pylist()[0]["name"])
+
+
+if __name__ == "__main__":
+    unittest.main()
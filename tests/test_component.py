@@ -3,12 +3,23 @@ Created on 12. 11. 2018
 
 @author: esner
 '''
+import json
+import tempfile
 import unittest
 import mock
 import os
 from freezegun import freeze_time
 
-from component import Component
+from component import Component, DEFAULT_START_DATE
+from configuration import Configuration
+from keboola.component.exceptions import UserException
+
+PARAMETERS = {
+    "authentication": {"email": "user@test.com", "#api_token": "token", "sub_domain": "test"},
+    "sync_options": {"sync_mode": "incremental_sync"},
+    "destination": {"load_type": "incremental_load"},
+    "available_details": {"ticket_comments_raw": True, "ticket_audits_raw": False},
+}
 
 
 class TestComponent(unittest.TestCase):
@@ -22,6 +33,58 @@ class TestComponent(unittest.TestCase):
             comp = Component()
             comp.run()
 
+    def _component(self, parameters):
+        data_dir = tempfile.mkdtemp()
+        with open(os.path.join(data_dir, "config.json"), "w") as config_file:
+            json.dump({"parameters": parameters}, config_file)
+        with mock.patch.dict(os.environ, {"KBC_DATADIR": data_dir}):
+            comp = Component()
+        comp.params = Configuration(**parameters)
+        comp.views = comp._select_views()
+        return comp
+
+    def test_resources_continue_from_own_watermarks(self):
+        comp = self._component(PARAMETERS)
+        previous_state = {"time": {"previousStart": 300},
+                          "resources": {"tickets": {"start_time": 300, "after_cursor": "abc"},
+                                        "ticket_audits": {"start_time": 100}}}
+        resources_state = comp._get_resources_state(previous_state, 300)
+
+        self.assertEqual(resources_state["tickets"], {"start_time": 300, "after_cursor": "abc"})
+        # resource without a watermark was never loaded, turned off resource is not loaded
+        self.assertEqual(resources_state["ticket_comments"], {"start_time": DEFAULT_START_DATE})
+        self.assertNotIn("ticket_audits", resources_state)
+
+        comp.resources_state = resources_state
+        state = comp._build_state(previous_state, 500)
+        self.assertEqual(state["resources"]["tickets"], {"start_time": 500, "after_cursor": "abc"})
+        self.assertEqual(state["resources"]["ticket_comments"], {"start_time": 500})
+        self.assertEqual(state["resources"]["ticket_audits"], {"start_time": 100})
+
+    def test_legacy_state_uses_previous_start(self):
+        comp = self._component(PARAMETERS)
+        resources_state = comp._get_resources_state({"time": {"previousStart": 300}}, 300)
+        self.assertEqual(resources_state["users"], {"start_time": 300})
+
+    def test_output_tables_select_their_resources(self):
+        destination = {"load_type": "incremental_load", "output_tables": ["users_photos", "tickets_comments"]}
+        comp = self._component({**PARAMETERS, "destination": destination})
+        self.assertEqual({view.name for view in comp.views}, {"users_photos", "tickets_comments"})
+        self.assertEqual(comp._selected_resources(), {"users_raw", "ticket_comments_raw"})
+
+        # the sideloaded users come with the tickets export
+        sync_options = {"sync_mode": "incremental_sync", "sideload_ticket_entities": True}
+        comp = self._component({**PARAMETERS, "destination": destination, "sync_options": sync_options})
+        self.assertEqual(comp._selected_resources(), {"tickets_raw", "ticket_comments_raw"})
+
+        # a full load replaces the tables, so the users come from their own export
+        full_load = {**destination, "load_type": "full_load"}
+        comp = self._component({**PARAMETERS, "destination": full_load, "sync_options": sync_options})
+        self.assertEqual(comp._selected_resources(), {"users_raw", "ticket_comments_raw"})
+
+        with self.assertRaises(UserException):
+            self._component({**PARAMETERS, "destination": {"load_type": "full_load", "output_tables": ["calls"]}})
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
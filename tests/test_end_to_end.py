@@ -0,0 +1,371 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import duckdb
+import mock
+
+from component import Component
+from tests.zendesk_mock_server import ZendeskMockServer
+
+PARAMETERS = {
+    "authentication": {"email": "user@mock.com", "#api_token": "token", "sub_domain": "mock"},
+    "sync_options": {"sync_mode": "full_sync"},
+    "destination": {"load_type": "full_load"},
+    "available_details": {"ticket_comments_raw": True, "ticket_audits_raw": True},
+}
+
+
+class TestEndToEnd(unittest.TestCase):
+
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.data_dir, "out", "tables"))
+        os.makedirs(os.path.join(self.data_dir, "out", "files"))
+        self._write_config(PARAMETERS)
+
+    def _write_config(self, parameters):
+        with open(os.path.join(self.data_dir, "config.json"), "w") as config_file:
+            json.dump({"parameters": parameters, "storage": {}, "action": "run"}, config_file)
+
+    def _run(self, server):
+        with mock.patch.dict(os.environ, {"KBC_DATADIR": self.data_dir, "SOURCES__URL_PREFIX": server.url}):
+            Component().run()
+
+    def _continue_from_state(self):
+        # the next run reads the state file written by the last one like after a successful job
+        os.makedirs(os.path.join(self.data_dir, "in"), exist_ok=True)
+        os.replace(os.path.join(self.data_dir, "out", "state.json"), os.path.join(self.data_dir, "in", "state.json"))
+
+    def _rows(self, table):
+        with open(os.path.join(self.data_dir, "out", "tables", f"{table}.csv")) as f:
+            return list(csv.reader(f))
+
+    def test_run_against_mock_server(self):
+        with ZendeskMockServer(tickets=30, users=5, organizations=2, comments_per_ticket=2) as server:
+            self._run(server)
+
+        self.assertEqual(len(self._rows("tickets")), 30)
+        self.assertEqual(len(self._rows("tickets_comments")), 60)
+        self.assertEqual(len(self._rows("tickets_audits")), 60)
+        self.assertEqual(len(self._rows("users")), 5)
+        self.assertEqual(len(self._rows("organizations")), 2)
+        self.assertEqual(server.requests["comments"], 30)
+
+        with open(os.path.join(self.data_dir, "out", "state.json")) as f:
+            state = json.load(f)
+        self.assertEqual(state["resources"]["tickets"]["after_cursor"], "30")
+
+        with open(os.path.join(self.data_dir, "artifacts", "out", "current", "run_metrics.json")) as f:
+            metrics = json.load(f)
+        self.assertEqual(metrics["requests"]["comments"]["requests"], 30)
+        self.assertEqual(metrics["tables"]["tickets_raw"]["rows_extracted"], 30)
+        self.assertEqual(set(metrics["stages"]), {"extract", "normalize", "load", "views", "export"})
+        self.assertIn("tickets", metrics["views"])
+
+    def test_details_from_ticket_events(self):
+        self._write_config({**PARAMETERS, "sync_options": {"sync_mode": "full_sync", "details_source": "ticket_events"}})
+        # the 1200 events come in two pages which share the event at their boundary
+        with ZendeskMockServer(tickets=600, users=5, organizations=2, comments_per_ticket=2) as server:
+            self._run(server)
+
+        self.assertEqual(server.requests["ticket_events"], 2)
+        self.assertEqual(server.requests["comments"], 0)
+        self.assertEqual(server.requests["audits"], 0)
+        comment_ids = [row[0] for row in self._rows("tickets_comments")]
+        self.assertEqual(len(comment_ids), 1200)
+        self.assertEqual(len(set(comment_ids)), 1200)
+        audit_ids = [row[0] for row in self._rows("tickets_audits")]
+        self.assertEqual(len(audit_ids), 1200)
+        self.assertEqual(len(set(audit_ids)), 1200)
+
+    def test_organizations_in_several_pages(self):
+        # the 1500 organizations come in two pages which share the organization at their boundary
+        with ZendeskMockServer(tickets=30, users=5, organizations=1500) as server:
+            self._run(server)
+
+        self.assertEqual(server.requests["organizations"], 2)
+        organization_ids = [row[0] for row in self._rows("organizations")]
+        self.assertEqual(len(organization_ids), 1500)
+        self.assertEqual(len(set(organization_ids)), 1500)
+
+    def test_organization_changed_during_export(self):
+        # the organization at the page boundary is changed before the second page is served with it again
+        with ZendeskMockServer(tickets=30, users=5, organizations=1500) as server:
+            handle = server.handle
+
+            def change_after_first_page(path, query, *args):
+                response = handle(path, query, *args)
+                if path == "/api/v2/incremental/organizations.json" and server.requests["organizations"] == 1:
+                    server.update_organization(1000, name="Changed", updated_at="2030-01-01T00:00:00Z")
+                return response
+
+            with mock.patch.object(server, "handle", side_effect=change_after_first_page):
+                self._run(server)
+
+        self.assertEqual(server.requests["organizations"], 2)
+        organization_names = [row[1] for row in self._rows("organizations") if row[0] == "1000"]
+        self.assertIn("Changed", organization_names)
+        self.assertEqual(len({row[0] for row in self._rows("organizations")}), 1500)
+
+    def test_parquet_output(self):
+        self._write_config({**PARAMETERS, "destination": {"load_type": "full_load", "output_format": "parquet",
+                                                          "destination_bucket": "in.c-zendesk"}})
+        with ZendeskMockServer(tickets=30, users=5, organizations=2) as server:
+            self._run(server)
+
+        # the Parquet files go to the file storage, no Storage table is written
+        self.assertEqual(os.listdir(os.path.join(self.data_dir, "out", "tables")), [])
+        files_dir = os.path.join(self.data_dir, "out", "files")
+        tickets_file = os.path.join(files_dir, "tickets.parquet")
+        self.assertEqual(duckdb.sql(f"SELECT count(*) FROM '{tickets_file}'").fetchone()[0], 30)
+        self.assertEqual(duckdb.sql(f"SELECT count(*) FROM '{files_dir}/tickets_comments.parquet'").fetchone()[0], 60)
+        with open(f"{tickets_file}.manifest") as f:
+            self.assertEqual(json.load(f)["tags"], ["zendesk", "tickets", "in.c-zendesk"])
+
+    def test_sliced_output(self):
+        self._write_config({**PARAMETERS, "destination": {"load_type": "full_load", "sliced_output": True}})
+        with ZendeskMockServer(tickets=30, users=5, organizations=2) as server:
+            self._run(server)
+
+        self.assertEqual(self._slices("tickets"), ["slice_0.csv"])
+        self._assert_sliced_table("tickets", 30)
+        self._assert_sliced_table("tickets_comments", 60)
+
+    def test_sliced_gzip_output(self):
+        self._write_config({**PARAMETERS, "destination": {"load_type": "full_load", "sliced_output": True,
+                                                          "compress_output": True}})
+        with ZendeskMockServer(tickets=30, users=5, organizations=2) as server:
+            self._run(server)
+
+        self.assertEqual(self._slices("tickets"), ["slice_0.csv.gz"])
+        self._assert_sliced_table("tickets", 30)
+        self._assert_sliced_table("tickets_comments", 60)
+
+    def _slices(self, table):
+        return sorted(os.listdir(os.path.join(self.data_dir, "out", "tables", f"{table}.csv")))
+
+    def _assert_sliced_table(self, table, row_count):
+        # a sliced table is a folder of header-less CSV files, the columns are listed by the manifest
+        rows = []
+        for name in self._slices(table):
+            path = os.path.join(self.data_dir, "out", "tables", f"{table}.csv", name)
+            with (gzip.open(path, "rt") if name.endswith(".gz") else open(path)) as f:
+                rows += list(csv.reader(f))
+        with open(os.path.join(self.data_dir, "out", "tables", f"{table}.csv.manifest")) as f:
+            columns = json.load(f)["columns"]
+        self.assertEqual(len(rows), row_count)
+        self.assertEqual(columns[0], "id")
+        self.assertTrue(all(len(row) == len(columns) for row in rows))
+        self.assertNotIn("id", [row[0] for row in rows])
+
+    def test_full_sync_backfill_in_windows(self):
+        self._write_config({**PARAMETERS, "performance": {"backfill_windows": 4}})
+        # tickets changed over several years are split into windows of the export
+        with ZendeskMockServer(tickets=30, users=5, organizations=2, interval=90 * 86400) as server:
+            self._run(server)
+
+        ticket_ids = [row[0] for row in self._rows("tickets")]
+        self.assertEqual(sorted(ticket_ids, key=int), [str(i) for i in range(1, 31)])
+        # the first page read to split the range is the first page of the first window
+        self.assertEqual(server.requests["tickets"], 4)
+        with open(os.path.join(self.data_dir, "out", "state.json")) as f:
+            self.assertEqual(json.load(f)["resources"]["tickets"]["after_cursor"], "30")
+
+    def test_incremental_sync_sideloads_ticket_entities(self):
+        self._write_config({**PARAMETERS, "sync_options": {"sync_mode": "incremental_sync",
+                                                           "sideload_ticket_entities": True},
+                            "destination": {"load_type": "incremental_load"},
+                            "performance": {"backfill_windows": 2}})
+        # every user, organization and group is referenced by some ticket
+        with ZendeskMockServer(tickets=30, users=8, organizations=3, interval=30 * 86400) as server:
+            self._run(server)
+
+        self.assertEqual(len(self._rows("tickets")), 30)
+        self.assertEqual(sorted(int(row[0]) for row in self._rows("users")), [1, 2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual(sorted(int(row[0]) for row in self._rows("organizations")), [1, 2, 3])
+        self.assertEqual(sorted(int(row[0]) for row in self._rows("groups")), [1, 2, 3, 4, 5])
+        self.assertEqual(len(self._rows("tickets_comments")), 60)
+        self.assertEqual(server.requests["users"], 0)
+        self.assertEqual(server.requests["organizations"], 0)
+        self.assertEqual(server.requests["groups"], 0)
+        with open(os.path.join(self.data_dir, "out", "state.json")) as f:
+            resources = json.load(f)["resources"]
+        self.assertNotIn("users", resources)
+        self.assertEqual(resources["tickets"]["after_cursor"], "30")
+
+    def test_output_tables_call_only_their_endpoints(self):
+        destination = {"load_type": "full_load", "output_tables": ["tickets_comments", "groups"]}
+        self._write_config({**PARAMETERS, "destination": destination})
+        with ZendeskMockServer(tickets=30, users=5, organizations=2) as server:
+            self._run(server)
+
+        self.assertEqual(sorted(os.listdir(os.path.join(self.data_dir, "out", "tables"))),
+                         ["groups.csv", "groups.csv.manifest", "tickets_comments.csv", "tickets_comments.csv.manifest"])
+        self.assertEqual(len(self._rows("tickets_comments")), 60)
+        self.assertEqual(set(server.requests), {"tickets", "comments", "groups"})
+        with open(os.path.join(self.data_dir, "out", "state.json")) as f:
+            # the tickets export only fed the comments, so the tickets keep their watermark
+            self.assertEqual(set(json.load(f)["resources"]), {"ticket_comments"})
+
+    def test_unchanged_reference_endpoints_are_not_exported(self):
+        self._write_config({**PARAMETERS, "sync_options": {"sync_mode": "incremental_sync"},
+                            "performance": {"cache_reference_endpoints": True}})
+        tables_dir = os.path.join(self.data_dir, "out", "tables")
+        with ZendeskMockServer(tickets=30, users=5, organizations=2) as server:
+            self._run(server)
+            self.assertIn("groups.csv", os.listdir(tables_dir))
+
+            # the next run continues from the state of the first one
+            os.makedirs(os.path.join(self.data_dir, "in"))
+            shutil.move(os.path.join(self.data_dir, "out", "state.json"), os.path.join(self.data_dir, "in"))
+            shutil.rmtree(tables_dir)
+            os.makedirs(tables_dir)
+            self._run(server)
+
+        exported = {name for name in os.listdir(tables_dir) if not name.endswith(".manifest")}
+        self.assertFalse(exported & {"groups.csv", "users_groups.csv", "tags.csv", "tickets_fields.csv"})
+        self.assertEqual(server.not_modified, 4)
+
+    def test_persistent_database_replaces_reference_tables(self):
+        self._write_config({**PARAMETERS, "sync_options": {"sync_mode": "incremental_sync"},
+                            "performance": {"persistent_database": True, "cache_reference_endpoints": True}})
+        store = LocalDatabaseStore(os.path.join(self.data_dir, "stored.duckdb"))
+        tables_dir = os.path.join(self.data_dir, "out", "tables")
+
+        def run(group_memberships):
+            with ZendeskMockServer(tickets=30, users=5, organizations=2, group_memberships=group_memberships) as server:
+                self._run(server)
+            self._continue_from_state()
+
+        with mock.patch.object(Component, "_init_database_store", return_value=store):
+            run(10)
+            self.assertEqual(len(self._rows("users_groups")), 10)
+
+            # half of the memberships were deleted
+            shutil.rmtree(tables_dir)
+            os.makedirs(tables_dir)
+            run(5)
+            self.assertEqual(len(self._rows("users_groups")), 5)
+
+            # the unchanged memberships are not exported again
+            shutil.rmtree(tables_dir)
+            os.makedirs(tables_dir)
+            run(5)
+            self.assertNotIn("users_groups.csv", os.listdir(tables_dir))
+
+    def test_details_of_uncommitted_run_are_fetched_again(self):
+        self._write_config({**PARAMETERS, "sync_options": {"sync_mode": "incremental_sync"},
+                            "destination": {"load_type": "incremental_load"},
+                            "performance": {"persistent_database": True}})
+        store = LocalDatabaseStore(os.path.join(self.data_dir, "stored.duckdb"))
+        tables_dir = os.path.join(self.data_dir, "out", "tables")
+        with mock.patch.object(Component, "_init_database_store", return_value=store):
+            with ZendeskMockServer(tickets=30, users=5, organizations=2) as server:
+                self._run(server)
+
+            # the output mapping of the job failed, so neither its tables nor its state file were committed
+            shutil.rmtree(tables_dir)
+            os.makedirs(tables_dir)
+            os.remove(os.path.join(self.data_dir, "out", "state.json"))
+            with ZendeskMockServer(tickets=30, users=5, organizations=2) as server:
+                self._run(server)
+
+        self.assertEqual(server.requests["comments"], 30)
+        self.assertEqual(len(self._rows("tickets")), 30)
+        self.assertEqual(len(self._rows("tickets_comments")), 60)
+        self.assertEqual(len(self._rows("tickets_audits")), 60)
+
+    def test_changed_rows_only(self):
+        parameters = {**PARAMETERS, "destination": {"load_type": "incremental_load", "changed_rows_only": True},
+                      "performance": {"persistent_database": True}}
+        self._write_config(parameters)
+        store = LocalDatabaseStore(os.path.join(self.data_dir, "stored.duckdb"))
+        with mock.patch.object(Component, "_init_database_store", return_value=store):
+            with ZendeskMockServer(tickets=30, users=5, organizations=2) as server:
+                self._run(server)
+                self.assertEqual(len(self._rows("tickets")), 30)
+
+                # the second full sync extracts the same rows except of one changed ticket
+                server.update_ticket(3, subject="Changed")
+                self._continue_from_state()
+                self._run(server)
+
+        self.assertEqual([row[0] for row in self._rows("tickets")], ["3"])
+        self.assertEqual(self._rows("users"), [])
+        self.assertEqual(self._rows("tickets_comments"), [])
+
+    def test_changed_rows_of_uncommitted_run_are_exported_again(self):
+        self._write_config({**PARAMETERS, "sync_options": {"sync_mode": "incremental_sync"},
+                            "destination": {"load_type": "incremental_load", "changed_rows_only": True},
+                            "performance": {"persistent_database": True}})
+        store = LocalDatabaseStore(os.path.join(self.data_dir, "stored.duckdb"))
+        tables_dir = os.path.join(self.data_dir, "out", "tables")
+        with mock.patch.object(Component, "_init_database_store", return_value=store):
+            with ZendeskMockServer(tickets=30, users=5, organizations=2) as server:
+                self._run(server)
+
+                # the output mapping of the job failed, so neither its tables nor its state file were committed
+                shutil.rmtree(tables_dir)
+                os.makedirs(tables_dir)
+                os.remove(os.path.join(self.data_dir, "out", "state.json"))
+                self._run(server)
+
+        self.assertEqual(len(self._rows("tickets")), 30)
+        self.assertEqual(len(self._rows("tickets_comments")), 60)
+        self.assertEqual(len(self._rows("users")), 5)
+
+    def test_resume_from_checkpoint(self):
+        parameters = {**PARAMETERS, "destination": {"load_type": "incremental_load"},
+                      "available_details": {"ticket_comments_raw": False, "ticket_audits_raw": False},
+                      "performance": {"persistent_database": True, "checkpoint_pages": 1}}
+        self._write_config(parameters)
+        store = LocalDatabaseStore(os.path.join(self.data_dir, "stored.duckdb"))
+        save_checkpoint = Component._save_checkpoint
+
+        def save_and_crash(component, *args):
+            # the container is killed after the second checkpoint of the three pages of tickets
+            save_checkpoint(component, *args)
+            if component.resources_state["tickets"]["after_cursor"] == "2000":
+                component.pipeline_connection.close()
+                raise RuntimeError("Killed")
+
+        with mock.patch.object(Component, "_init_database_store", return_value=store):
+            with ZendeskMockServer(tickets=2500, users=5, organizations=2) as server, \
+                    mock.patch.object(Component, "_save_checkpoint", save_and_crash):
+                with self.assertRaises(RuntimeError):
+                    self._run(server)
+
+            with ZendeskMockServer(tickets=2500, users=5, organizations=2) as server:
+                self._run(server)
+
+        # only the last page is requested again, the rows of the checkpointed loads are exported as well
+        self.assertEqual(server.requests["tickets"], 1)
+        self.assertEqual(len(self._rows("tickets")), 2500)
+        with open(os.path.join(self.data_dir, "out", "state.json")) as f:
+            self.assertEqual(json.load(f)["resources"]["tickets"]["after_cursor"], "2500")
+
+
+class LocalDatabaseStore:
+    """
+    Keeps the database in a local file instead of the file storage
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def restore(self, database_file):
+        if os.path.exists(self.path):
+            shutil.copy(self.path, database_file)
+        return os.path.exists(self.path)
+
+    def save(self, database_file):
+        shutil.copy(database_file, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
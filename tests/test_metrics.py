@@ -0,0 +1,24 @@
+import unittest
+
+from dlt_zendesk.helpers.metrics import RequestMetrics
+
+
+class TestRequestMetrics(unittest.TestCase):
+
+    def test_latency_percentiles(self):
+        metrics = RequestMetrics()
+        for latency in range(1, 101):
+            metrics.record("tickets", latency / 1000, 10, 0.5)
+
+        summary = metrics.summary()["tickets"]
+        self.assertEqual(summary["requests"], 100)
+        self.assertEqual(summary["bytes"], 1000)
+        self.assertEqual(summary["throttled_seconds"], 50)
+        # the percentiles are the upper bounds of their 5 % latency buckets
+        for percentile in (50, 90, 99):
+            self.assertGreaterEqual(summary[f"latency_p{percentile}_ms"], percentile)
+            self.assertLessEqual(summary[f"latency_p{percentile}_ms"], percentile * 1.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
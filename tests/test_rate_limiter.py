@@ -0,0 +1,63 @@
+import unittest
+
+import mock
+
+from dlt_zendesk.helpers.rate_limiter import RateLimiter
+
+EXPORT_URL = "https://test.zendesk.com/api/v2/incremental/tickets/cursor.json"
+GROUPS_URL = "https://test.zendesk.com/api/v2/groups.json"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("dlt_zendesk.helpers.rate_limiter.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_learns_budget_from_headers(self):
+        limiter = RateLimiter(requests_per_minute=200)
+        limiter.update({"X-Rate-Limit": "700", "X-Rate-Limit-Remaining": "650"})
+        self.assertAlmostEqual(limiter.rate, 700 * 0.9 / 60)
+
+    def test_waits_when_bucket_is_empty(self):
+        limiter = RateLimiter(requests_per_minute=60, safety_factor=1)
+        limiter.update({"X-Rate-Limit": "60", "X-Rate-Limit-Remaining": "1"})
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertAlmostEqual(limiter.acquire(), 1)
+
+    def test_block_waits_retry_after(self):
+        limiter = RateLimiter()
+        limiter.block(30)
+        self.assertAlmostEqual(limiter.acquire(), 30)
+        self.assertAlmostEqual(limiter.acquire(), 60 / limiter._capacity)
+
+    def test_exports_have_their_own_bucket(self):
+        limiter = RateLimiter(requests_per_minute=600, safety_factor=1, export_requests_per_minute=6)
+        for _ in range(6):
+            self.assertEqual(limiter.acquire(EXPORT_URL), 0)
+        self.assertAlmostEqual(limiter.acquire(EXPORT_URL), 10)
+        # the other endpoints are paced by the account budget only
+        self.assertEqual(limiter.acquire(GROUPS_URL), 0)
+
+    def test_rate_limited_export_blocks_only_exports(self):
+        limiter = RateLimiter()
+        limiter.block(30, EXPORT_URL)
+        self.assertEqual(limiter.acquire(GROUPS_URL), 0)
+        self.assertAlmostEqual(limiter.acquire(EXPORT_URL), 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
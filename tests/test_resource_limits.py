@@ -0,0 +1,29 @@
+import unittest
+
+import mock
+
+import resource_limits
+
+
+class TestResourceLimits(unittest.TestCase):
+
+    @mock.patch("resource_limits.os.cpu_count", return_value=16)
+    def test_cpu_limit_from_cgroup_quota(self, _):
+        files = {resource_limits.CGROUP_CPU_MAX: "250000 100000"}
+        with mock.patch("resource_limits._read", side_effect=files.get):
+            self.assertEqual(resource_limits.cpu_limit(), 2)
+
+    @mock.patch("resource_limits.os.cpu_count", return_value=16)
+    def test_cpu_limit_without_quota(self, _):
+        files = {resource_limits.CGROUP_CPU_MAX: "max 100000"}
+        with mock.patch("resource_limits._read", side_effect=files.get):
+            self.assertEqual(resource_limits.cpu_limit(), 16)
+
+    def test_memory_limit_from_cgroup(self):
+        files = {resource_limits.CGROUP_V1_MEMORY_LIMIT: str(512 * 1024 * 1024)}
+        with mock.patch("resource_limits._read", side_effect=files.get):
+            self.assertEqual(resource_limits.memory_limit(), 512 * 1024 * 1024)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from dlt_zendesk.helpers.ticket_index import TicketIndex
+
+
+class TestTicketIndex(unittest.TestCase):
+
+    def test_skips_unchanged_tickets(self):
+        index = TicketIndex([(1, 2, "2024-01-01T00:00:00Z", 100)])
+        ticket = {"id": 1, "comment_count": 2, "updated_at": "2024-01-01T00:00:00Z"}
+        self.assertFalse(index.has_new_comments(ticket))
+        self.assertFalse(index.has_new_audits(ticket))
+
+        updated = {"id": 1, "comment_count": 3, "updated_at": "2024-02-01T00:00:00Z"}
+        self.assertTrue(index.has_new_comments(updated))
+        self.assertTrue(index.has_new_audits(updated))
+
+    def test_new_ticket_without_comments(self):
+        index = TicketIndex()
+        ticket = {"id": 2, "comment_count": 0, "updated_at": "2024-01-01T00:00:00Z"}
+        self.assertFalse(index.has_new_comments(ticket))
+        self.assertTrue(index.has_new_audits(ticket))
+
+    def test_comments_and_audits_are_tracked_separately(self):
+        index = TicketIndex(run_start=200)
+        ticket = {"id": 3, "comment_count": 1, "updated_at": "2024-01-01T00:00:00Z"}
+        index.comments_fetched(ticket)
+        self.assertFalse(index.has_new_comments(ticket))
+        self.assertTrue(index.has_new_audits(ticket))
+
+        index.audits_fetched(ticket)
+        self.assertEqual(list(index.rows()), [(3, 1, "2024-01-01T00:00:00Z", 200)])
+
+    def test_fetched_tickets_get_the_run_start(self):
+        index = TicketIndex([(1, 2, "2024-01-01T00:00:00Z", 100), (2, 1, "2024-01-01T00:00:00Z", 100)], run_start=200)
+        index.comments_fetched({"id": 2, "comment_count": 3, "updated_at": "2024-02-01T00:00:00Z"})
+        self.assertEqual(sorted(index.rows()), [(1, 2, "2024-01-01T00:00:00Z", 100),
+                                                (2, 3, "2024-01-01T00:00:00Z", 200)])
+
+
+if __name__ == "__main__":
+    unittest.main()
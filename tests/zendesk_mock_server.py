@@ -0,0 +1,498 @@
+"""
+Local stand-in for the Zendesk Support API used by the end-to-end tests and benchmarks.
+
+The data are generated on the fly from the item positions, so any scale can be served without memory overhead.
+The server implements the cursor, offset, time based stream, cursor based stream and start_time pagination styles
+and an account-wide rate limit answered by 429 responses with the `Retry-After` header. The tickets export
+sideloads the users, groups and organizations of its tickets. The time based organizations and ticket events exports
+start their next page at the time of the last item like Zendesk, so the item at the page boundary is repeated.
+Every response carries an `ETag` and a request with the same `If-None-Match` is answered by 304 without a body.
+"""
+import hashlib
+import json
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# timestamp of the first generated item
+BASE_TIME = 1577836800
+DEFAULT_PAGE_SIZE = 100
+INCREMENTAL_PAGE_SIZE = 1000
+# rate limit announced in the headers when the server does not limit the requests
+UNLIMITED_RATE = 1000000
+
+
+class ZendeskMockServer:
+    """
+    Threaded HTTP server generating synthetic tickets, users, organizations, comments and audits.
+
+    Usage:
+        with ZendeskMockServer(tickets=10000) as server:
+            client = ZendeskAPIClient(credentials, url_prefix=server.url)
+    """
+
+    def __init__(self, tickets: int = 1000, users: int = 100, organizations: int = 10, comments_per_ticket: int = 2,
+                 audits_per_ticket: int = 2, group_memberships: int = 10, rate_limit: Optional[int] = None,
+                 latency: float = 0.0, interval: int = 60, port: int = 0) -> None:
+        """
+        Args:
+            tickets: Number of generated tickets, users, organizations and groups are referenced from them
+            users: Number of generated users
+            organizations: Number of generated organizations
+            comments_per_ticket: Number of comments of each ticket
+            audits_per_ticket: Number of audits of each ticket, the first ones hold the comments
+            group_memberships: Number of generated group memberships
+            rate_limit: Requests per minute served before 429 responses, unlimited by default
+            latency: Seconds added to each response
+            interval: Seconds between the changes of two consecutive items, e.g. tickets
+            port: Port to listen on, a free one is picked by default
+        """
+        self.tickets = tickets
+        self.users = users
+        self.organizations = organizations
+        self.comments_per_ticket = comments_per_ticket
+        self.audits_per_ticket = max(audits_per_ticket, comments_per_ticket)
+        self.group_memberships = group_memberships
+        self.rate_limit = rate_limit
+        self.latency = latency
+        self.interval = interval
+
+        # fields of the changed items keyed by the endpoint and the item id
+        self._changes: Dict[str, Dict[int, Dict[str, Any]]] = defaultdict(dict)
+        self.requests = Counter()
+        self.items = Counter()
+        self.bytes_sent = 0
+        self.rate_limited = 0
+        self.not_modified = 0
+        self._request_times = deque()
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ZendeskMockServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "ZendeskMockServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def update_ticket(self, ticket_id: int, **fields: Any) -> None:
+        """
+        Changes the fields of a generated ticket, e.g. its `subject`, in the following responses
+        """
+        self._update("tickets", ticket_id, fields)
+
+    def update_organization(self, organization_id: int, **fields: Any) -> None:
+        """
+        Changes the fields of a generated organization, e.g. its `updated_at`, in the following responses
+        """
+        self._update("organizations", organization_id, fields)
+
+    def _update(self, name: str, item_id: int, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            changes = self._changes[name]
+            changes[item_id] = {**changes.get(item_id, {}), **fields}
+
+    def handle(self, path: str, query: Dict[str, str], if_none_match: Optional[str] = None) \
+            -> Tuple[int, Dict[str, str], Optional[Dict[str, Any]]]:
+        """
+        Answers a GET request
+
+        Returns:
+            Tuple of the status code, response headers and the JSON body
+        """
+        retry_after, remaining = self._take_request()
+        limit = self.rate_limit or UNLIMITED_RATE
+        headers = {"X-Rate-Limit": str(limit), "X-Rate-Limit-Remaining": str(remaining)}
+        if retry_after:
+            with self._lock:
+                self.rate_limited += 1
+            return 429, {**headers, "Retry-After": str(retry_after)}, None
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        route = self._route(path)
+        if route is None:
+            return 404, headers, {"error": "RecordNotFound", "description": "Not found"}
+        name, body = route(f"{self.url}{path}", query)
+        headers["ETag"] = f'W/"{hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()}"'
+        with self._lock:
+            self.requests[name] += 1
+            if if_none_match == headers["ETag"]:
+                self.not_modified += 1
+                return 304, headers, None
+            self.items[name] += len(body.get(name, []))
+        return 200, headers, body
+
+    def _take_request(self) -> Tuple[int, int]:
+        """
+        Counts the request in the sliding minute window of the rate limit
+
+        Returns:
+            Tuple of the seconds to wait when the limit is exceeded (0 otherwise) and the remaining requests
+        """
+        if not self.rate_limit:
+            return 0, UNLIMITED_RATE
+        with self._lock:
+            now = time.monotonic()
+            while self._request_times and self._request_times[0] <= now - 60:
+                self._request_times.popleft()
+            if len(self._request_times) >= self.rate_limit:
+                return max(1, math.ceil(self._request_times[0] + 60 - now)), 0
+            self._request_times.append(now)
+            return 0, self.rate_limit - len(self._request_times)
+
+    def _route(self, path: str) -> Optional[Callable[[str, Dict[str, str]], Tuple[str, Dict[str, Any]]]]:
+        routes = {
+            "/api/v2/incremental/tickets/cursor.json": self._incremental_tickets,
+            "/api/v2/incremental/users/cursor.json": self._incremental_users,
+            "/api/v2/incremental/organizations.json": self._incremental_organizations,
+            "/api/v2/incremental/ticket_events.json": self._incremental_ticket_events,
+            "/api/v2/groups.json": self._list("groups", 5, self._group),
+            "/api/v2/group_memberships.json": self._list("group_memberships", self.group_memberships,
+                                                            self._group_membership),
+            "/api/v2/tags.json": self._list("tags", 20, self._tag),
+            "/api/v2/ticket_fields.json": self._list("ticket_fields", 10, self._ticket_field),
+        }
+        if path in routes:
+            return routes[path]
+        parts = path.split("/")
+        # /api/v2/tickets/{id}/comments.json and /api/v2/tickets/{id}/audits.json
+        if len(parts) == 6 and parts[3] == "tickets" and parts[4].isdigit() and 0 < int(parts[4]) <= self.tickets:
+            ticket_id = int(parts[4])
+            if parts[5] == "comments.json":
+                return self._list("comments", self.comments_per_ticket, lambda j: self._comment(ticket_id, j))
+            if parts[5] == "audits.json":
+                return self._list("audits", self.audits_per_ticket, lambda j: self._audit(ticket_id, j))
+        return None
+
+    def _incremental_tickets(self, url: str, query: Dict[str, str]) -> Tuple[str, Dict[str, Any]]:
+        page = _stream_cursor_page(url, query, "tickets", self.tickets, self._ticket, self._item_time)
+        # the users, groups and organizations referenced by the tickets of the page
+        includes = query.get("include", "").split(",")
+        tickets = page["tickets"]
+        if "users" in includes:
+            user_ids = {ticket[key] for ticket in tickets for key in ("requester_id", "submitter_id", "assignee_id")}
+            page["users"] = [self._user(user_id - 1) for user_id in sorted(user_ids)]
+        if "groups" in includes:
+            page["groups"] = [self._group(group_id - 1) for group_id in sorted({t["group_id"] for t in tickets})]
+        if "organizations" in includes:
+            organization_ids = sorted({ticket["organization_id"] for ticket in tickets})
+            page["organizations"] = [self._organization(organization_id - 1) for organization_id in organization_ids]
+        return "tickets", page
+
+    def _incremental_users(self, url: str, query: Dict[str, str]) -> Tuple[str, Dict[str, Any]]:
+        return "users", _stream_cursor_page(url, query, "users", self.users, self._user, self._item_time)
+
+    def _incremental_organizations(self, url: str, query: Dict[str, str]) -> Tuple[str, Dict[str, Any]]:
+        return "organizations", _stream_page(url, query, "organizations", self.organizations, self._organization,
+                                             self._item_time, overlap=True)
+
+    def _incremental_ticket_events(self, url: str, query: Dict[str, str]) -> Tuple[str, Dict[str, Any]]:
+        count = self.tickets * self.audits_per_ticket
+        return "ticket_events", _stream_page(url, query, "ticket_events", count, self._ticket_event,
+                                             self._event_time, overlap=True)
+
+    def _list(self, name: str, count: int, item: Callable[[int], Dict[str, Any]]) \
+            -> Callable[[str, Dict[str, str]], Tuple[str, Dict[str, Any]]]:
+        """
+        Endpoint listing a fixed number of items with the pagination style picked by the query parameters
+        """
+        def endpoint(url: str, query: Dict[str, str]) -> Tuple[str, Dict[str, Any]]:
+            if "page[size]" in query or "page[after]" in query:
+                return name, _cursor_page(url, query, name, count, item)
+            if "limit" in query:
+                return name, _start_time_page(url, query, name, count, item, self._item_time)
+            return name, _offset_page(url, query, name, count, item)
+        return endpoint
+
+    def _item_time(self, position: int) -> int:
+        return BASE_TIME + position * self.interval
+
+    def _event_time(self, position: int) -> int:
+        return self._item_time(position // self.audits_per_ticket) + position % self.audits_per_ticket
+
+    def _ticket(self, position: int) -> Dict[str, Any]:
+        ticket_id = position + 1
+        updated_at = self._item_time(position)
+        return {
+            "id": ticket_id,
+            "url": f"https://mock.zendesk.com/api/v2/tickets/{ticket_id}.json",
+            "type": "question",
+            "subject": f"Ticket {ticket_id}",
+            "description": "Synthetic ticket description " * 5,
+            "priority": "normal",
+            "status": ["new", "open", "pending", "solved", "closed"][ticket_id % 5],
+            "requester_id": ticket_id % max(self.users, 1) + 1,
+            "submitter_id": ticket_id % max(self.users, 1) + 1,
+            "assignee_id": (ticket_id * 7) % max(self.users, 1) + 1,
+            "organization_id": ticket_id % max(self.organizations, 1) + 1,
+            "group_id": ticket_id % 5 + 1,
+            "has_incidents": False,
+            "via": {"channel": "email", "source": {"from": {}, "to": {}, "rel": None}},
+            "custom_fields": [{"id": field_id, "value": f"value {ticket_id}"} for field_id in range(1, 6)],
+            "satisfaction_rating": {"id": ticket_id, "score": "good", "comment": "Thanks"},
+            "tags": ["mock", f"tag_{ticket_id % 20}"],
+            "created_at": _iso(updated_at - 3600),
+            "updated_at": _iso(updated_at),
+            "generated_timestamp": updated_at,
+            "comment_count": self.comments_per_ticket,
+            "metric_set": {
+                "id": ticket_id, "ticket_id": ticket_id, "reopens": 0, "replies": self.comments_per_ticket,
+                "reply_time_in_minutes": {"calendar": 30, "business": 15},
+                "first_resolution_time_in_minutes": {"calendar": 120, "business": 60},
+                "full_resolution_time_in_minutes": {"calendar": 240, "business": 120},
+                "agent_wait_time_in_minutes": {"calendar": 10, "business": 5},
+                "requester_wait_time_in_minutes": {"calendar": 20, "business": 10},
+                "created_at": _iso(updated_at - 3600), "updated_at": _iso(updated_at),
+            },
+            **self._changes["tickets"].get(ticket_id, {}),
+        }
+
+    def _user(self, position: int) -> Dict[str, Any]:
+        user_id = position + 1
+        updated_at = self._item_time(position)
+        return {
+            "id": user_id,
+            "name": f"User {user_id}",
+            "email": f"user{user_id}@mock.com",
+            "url": f"https://mock.zendesk.com/api/v2/users/{user_id}.json",
+            "role": "agent" if user_id % 10 == 0 else "end-user",
+            "active": True,
+            "verified": True,
+            "organization_id": user_id % max(self.organizations, 1) + 1,
+            "photo": {"id": user_id, "file_name": "photo.png", "content_url": "https://mock.zendesk.com/photo.png",
+                      "thumbnails": []},
+            "user_fields": {"level": "basic"},
+            "tags": ["mock"],
+            "created_at": _iso(updated_at - 3600),
+            "updated_at": _iso(updated_at),
+        }
+
+    def _organization(self, position: int) -> Dict[str, Any]:
+        organization_id = position + 1
+        updated_at = self._item_time(position)
+        return {
+            "id": organization_id,
+            "name": f"Organization {organization_id}",
+            "url": f"https://mock.zendesk.com/api/v2/organizations/{organization_id}.json",
+            "organization_fields": {},
+            "shared_tickets": False,
+            "shared_comments": False,
+            "external_id": None,
+            "created_at": _iso(updated_at - 3600),
+            "updated_at": _iso(updated_at),
+            "domain_names": [f"org{organization_id}.com"],
+            "details": None,
+            "notes": None,
+            "group_id": None,
+            "tags": [],
+            **self._changes["organizations"].get(organization_id, {}),
+        }
+
+    def _comment(self, ticket_id: int, position: int) -> Dict[str, Any]:
+        created_at = self._item_time(ticket_id - 1) + position
+        return {
+            "id": ticket_id * 1000 + position,
+            "audit_id": ticket_id * 1000 + 500 + position,
+            "type": "Comment",
+            "author_id": ticket_id % max(self.users, 1) + 1,
+            "body": f"Comment {position} of the ticket {ticket_id}",
+            "html_body": f"<div class=\"zd-comment\"><p>Comment {position} of the ticket {ticket_id}</p></div>",
+            "plain_body": f"Comment {position} of the ticket {ticket_id}",
+            "public": True,
+            "attachments": [],
+            "via": {"channel": "web", "source": {"from": {}, "to": {}, "rel": None}},
+            "metadata": {"system": {}},
+            "created_at": _iso(created_at),
+        }
+
+    def _audit(self, ticket_id: int, position: int) -> Dict[str, Any]:
+        created_at = self._item_time(ticket_id - 1) + position
+        events = [{"id": ticket_id * 1000 + position, "type": "Comment", "public": True,
+                   "body": f"Comment {position} of the ticket {ticket_id}"}] \
+            if position < self.comments_per_ticket else []
+        return {
+            "id": ticket_id * 1000 + 500 + position,
+            "ticket_id": ticket_id,
+            "author_id": ticket_id % max(self.users, 1) + 1,
+            "events": events + [{"id": ticket_id * 1000 + 900 + position, "type": "Change", "field_name": "status",
+                                 "value": "open"}],
+            "metadata": {"system": {}},
+            "via": {"channel": "web", "source": {"from": {}, "to": {}, "rel": None}},
+            "created_at": _iso(created_at),
+        }
+
+    def _ticket_event(self, position: int) -> Dict[str, Any]:
+        ticket_id = position // self.audits_per_ticket + 1
+        audit = self._audit(ticket_id, position % self.audits_per_ticket)
+        child_events = [{**event, "event_type": event["type"]} for event in audit["events"]]
+        for child in child_events:
+            if child["event_type"] == "Comment":
+                comment = self._comment(ticket_id, position % self.audits_per_ticket)
+                child.update(html_body=comment["html_body"], plain_body=comment["plain_body"], attachments=[])
+        return {
+            "id": audit["id"],
+            "ticket_id": ticket_id,
+            "updater_id": audit["author_id"],
+            "via": audit["via"],
+            "system": {},
+            "event_type": "Audit",
+            "timestamp": self._event_time(position),
+            "created_at": audit["created_at"],
+            "child_events": child_events,
+        }
+
+    @staticmethod
+    def _group(position: int) -> Dict[str, Any]:
+        return {"id": position + 1, "name": f"Group {position + 1}", "url": None, "deleted": False,
+                "created_at": _iso(BASE_TIME), "updated_at": _iso(BASE_TIME)}
+
+    @staticmethod
+    def _group_membership(position: int) -> Dict[str, Any]:
+        return {"id": position + 1, "default": True, "group_id": position % 5 + 1, "user_id": position + 1,
+                "created_at": _iso(BASE_TIME), "updated_at": _iso(BASE_TIME)}
+
+    @staticmethod
+    def _tag(position: int) -> Dict[str, Any]:
+        return {"name": f"tag_{position}", "count": position + 1}
+
+    @staticmethod
+    def _ticket_field(position: int) -> Dict[str, Any]:
+        return {"id": position + 1, "type": "text", "title": f"Field {position + 1}", "active": True, "tag": None}
+
+
+def _handler(server: ZendeskMockServer) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            status, headers, body = server.handle(url.path, query, self.headers.get("If-None-Match"))
+            content = json.dumps(body).encode("utf-8") if body is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(content)
+            with server._lock:
+                server.bytes_sent += len(content)
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+def _iso(timestamp: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+def _next_url(url: str, query: Dict[str, str], **changes: Any) -> str:
+    return f"{url}?{urlencode({**query, **changes})}"
+
+
+def _items(item: Callable[[int], Dict[str, Any]], start: int, stop: int) -> List[Dict[str, Any]]:
+    return [item(position) for position in range(start, stop)]
+
+
+def _cursor_page(url: str, query: Dict[str, str], name: str, count: int,
+                 item: Callable[[int], Dict[str, Any]]) -> Dict[str, Any]:
+    size = int(query.get("page[size]", DEFAULT_PAGE_SIZE))
+    start = int(query.get("page[after]", 0))
+    stop = min(start + size, count)
+    has_more = stop < count
+    return {
+        name: _items(item, start, stop),
+        "meta": {"has_more": has_more, "after_cursor": str(stop), "before_cursor": str(start)},
+        "links": {"next": _next_url(url, query, **{"page[after]": stop}) if has_more else None, "prev": None},
+    }
+
+
+def _offset_page(url: str, query: Dict[str, str], name: str, count: int,
+                 item: Callable[[int], Dict[str, Any]]) -> Dict[str, Any]:
+    size = int(query.get("per_page", DEFAULT_PAGE_SIZE))
+    page = int(query.get("page", 1))
+    start = (page - 1) * size
+    stop = min(start + size, count)
+    return {
+        name: _items(item, start, stop),
+        "count": count,
+        "next_page": _next_url(url, query, page=page + 1) if stop < count else None,
+        "previous_page": None,
+    }
+
+
+def _start_time_page(url: str, query: Dict[str, str], name: str, count: int, item: Callable[[int], Dict[str, Any]],
+                     item_time: Callable[[int], int]) -> Dict[str, Any]:
+    size = int(query.get("limit", INCREMENTAL_PAGE_SIZE))
+    start = bisect_left(range(count), int(query.get("start_time", 0)), key=item_time)
+    stop = min(start + size, count)
+    end_time = item_time(stop - 1) + 1 if stop > start else int(query.get("start_time", 0))
+    return {
+        name: _items(item, start, stop),
+        "count": stop - start,
+        "end_time": end_time,
+        "next_page": _next_url(url, query, start_time=end_time),
+    }
+
+
+def _stream_page(url: str, query: Dict[str, str], name: str, count: int, item: Callable[[int], Dict[str, Any]],
+                 item_time: Callable[[int], int], overlap: bool = False) -> Dict[str, Any]:
+    size = int(query.get("per_page", INCREMENTAL_PAGE_SIZE))
+    start = bisect_left(range(count), int(query.get("start_time", 0)), key=item_time)
+    stop = min(start + size, count)
+    # with the overlap the next page starts at the time of the last item, which is then served again
+    end_time = item_time(stop - 1) + (0 if overlap else 1) if stop > start else int(query.get("start_time", 0))
+    return {
+        name: _items(item, start, stop),
+        "count": stop - start,
+        "end_time": end_time,
+        "end_of_stream": stop >= count,
+        "next_page": _next_url(url, query, start_time=end_time),
+    }
+
+
+def _stream_cursor_page(url: str, query: Dict[str, str], name: str, count: int,
+                        item: Callable[[int], Dict[str, Any]], item_time: Callable[[int], int]) -> Dict[str, Any]:
+    size = int(query.get("per_page", INCREMENTAL_PAGE_SIZE))
+    if "cursor" in query:
+        start = int(query["cursor"])
+    else:
+        start = bisect_left(range(count), int(query.get("start_time", 0)), key=item_time)
+    stop = min(start + size, count)
+    query = {key: value for key, value in query.items() if key != "start_time"}
+    return {
+        name: _items(item, start, stop),
+        "after_cursor": str(stop),
+        "before_cursor": str(start),
+        "after_url": _next_url(url, query, cursor=stop),
+        "before_url": None,
+        "end_of_stream": stop >= count,
+    }